@@ -0,0 +1,100 @@
+#
+# ro_pair_map.py
+#
+# Mapping between LFSR values and pairs of unique RO indices, shared by the ro_map BRAM generators
+# (generate_coe.py of every ring_oscillator_puf version) and the Python analysis side.
+#
+# For n ROs the n * (n - 1) / 2 pairs (ro0 < ro1) are numbered in order: index 0 is (0, 1), index n - 2 is
+# (0, n - 1), index n - 1 is (1, 2), ... Both directions are closed form and vectorized:
+#   pair_index:  (ro0, ro1) -> row offset of ro0 + (ro1 - ro0 - 1)
+#   get_indices: index -> ro0 from the quadratic of the row offsets, then ro1
+# LFSR values past the last pair map to (0, 0).
+#
+
+import argparse
+import numpy as np
+
+G_N_ROS_MAIN = 32
+
+def n_pairs(n_ros):
+    return n_ros * (n_ros - 1) // 2
+
+def row_offset(ro0, n_ros):
+    """Index of the first pair (ro0, ro0 + 1) of row ro0."""
+    return ro0 * (2 * n_ros - ro0 - 1) // 2
+
+def pair_index(ro0, ro1, n_ros=G_N_ROS_MAIN):
+    """Index of the pair (ro0, ro1), ro0 < ro1, for scalars or arrays."""
+    ro0, ro1 = np.asarray(ro0, dtype=np.int64), np.asarray(ro1, dtype=np.int64)
+    if np.any(ro0 >= ro1) or np.any(ro0 < 0) or np.any(ro1 >= n_ros):
+        raise ValueError(f"Pairs must satisfy 0 <= ro0 < ro1 < {n_ros}")
+    index = row_offset(ro0, n_ros) + ro1 - ro0 - 1
+    return int(index) if index.ndim == 0 else index
+
+def get_indices(lfsr_val, n_ros=G_N_ROS_MAIN):
+    """(ro0, ro1) of an LFSR value, or of an array of them; (0, 0) past the last pair."""
+    index = np.asarray(lfsr_val, dtype=np.int64)
+    valid = (index >= 0) & (index < n_pairs(n_ros))
+    # Largest ro0 with row_offset(ro0) <= index, from the quadratic; float rounding is fixed up below
+    b = 2 * n_ros - 1
+    ro0 = np.floor((b - np.sqrt(np.maximum(b * b - 8 * index, 0))) / 2).astype(np.int64)
+    ro0 = np.clip(ro0, 0, n_ros - 2)
+    ro0 -= row_offset(ro0, n_ros) > index
+    ro0 += row_offset(ro0 + 1, n_ros) <= index
+    ro1 = index - row_offset(ro0, n_ros) + ro0 + 1
+    ro0, ro1 = np.where(valid, ro0, 0), np.where(valid, ro1, 0)
+    if ro0.ndim == 0:
+        return int(ro0), int(ro1)
+    return ro0, ro1
+
+def bram_geometry(n_ros):
+    """(depth, width) of the ro_map BRAM: a power of two covering every pair, and two RO index fields."""
+    index_bits = max(1, (n_ros - 1).bit_length())
+    depth = 1 << max(1, (n_pairs(n_ros) - 1).bit_length())
+    return depth, 2 * index_bits
+
+def ro_map(n_ros=G_N_ROS_MAIN, depth=None):
+    """BRAM words for every address: ro1 in the upper half, ro0 in the lower half."""
+    default_depth, width = bram_geometry(n_ros)
+    ro0, ro1 = get_indices(np.arange(depth or default_depth), n_ros)
+    return (ro1 << (width // 2)) | ro0
+
+def binary_lines(words, width):
+    """(n, width) ASCII '0'/'1' matrix of the words, MSB first."""
+    bits = (words[:, None] >> np.arange(width - 1, -1, -1)) & 1
+    return (bits + ord("0")).astype(np.uint8)
+
+def coe_bytes(n_ros=G_N_ROS_MAIN, depth=None):
+    """Contents of the .coe file for the Block Memory Generator."""
+    default_depth, width = bram_geometry(n_ros)
+    lines = binary_lines(ro_map(n_ros, depth), width)
+    separators = np.tile(np.frombuffer(b",\n", dtype=np.uint8), (len(lines), 1))
+    body = np.hstack([lines, separators]).tobytes()[:-2] + b";"
+    return b"MEMORY_INITIALIZATION_RADIX=2;\nMEMORY_INITIALIZATION_VECTOR=\n" + body
+
+def mem_bytes(n_ros=G_N_ROS_MAIN, depth=None):
+    """Contents of a .mem file ($readmemb / XPM memory init): one binary word per line."""
+    default_depth, width = bram_geometry(n_ros)
+    lines = binary_lines(ro_map(n_ros, depth), width)
+    newlines = np.full((len(lines), 1), ord("\n"), dtype=np.uint8)
+    return np.hstack([lines, newlines]).tobytes()
+
+def write_init_file(file_path, n_ros=G_N_ROS_MAIN, depth=None):
+    """Writes a .coe or .mem file (by extension) in one write; returns the number of entries."""
+    contents = mem_bytes(n_ros, depth) if str(file_path).endswith(".mem") else coe_bytes(n_ros, depth)
+    with open(file_path, "wb") as f:
+        f.write(contents)
+    return depth or bram_geometry(n_ros)[0]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Generate the ro_map BRAM init file (.coe or .mem).")
+    ap.add_argument("file_path", nargs="?", default="ro_map_init.coe", help="Output file, .coe or .mem.")
+    ap.add_argument("--n_ros", type=int, default=G_N_ROS_MAIN, help="Number of main ring oscillators.")
+    ap.add_argument("--depth", type=int, default=None, help="BRAM depth (default: next power of two).")
+    args = ap.parse_args()
+
+    entries = write_init_file(args.file_path, args.n_ros, args.depth)
+    print(f"Successfully generated '{args.file_path}' with {entries} entries.")
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,168 @@
 #!/usr/bin/env python3
 """
 UP:         python ro_placement.py hola.xdc 32 18 --main_x 42 --main_y 49 --lfsr_x 37 --lfsr_y 49
-RIGHT:      python ro_placement.py hola.xdc 32 18 --main_x    --main_y    --lfsr_x    --lfsr_y   
+RIGHT:      python ro_placement.py hola.xdc 32 18 --main_x 81 --main_y 99 --lfsr_x 37 --lfsr_y 99
 ALL_RIGHT:  python ro_placement.py hola.xdc 32 18 --main_x 65 --main_y 99 --lfsr_x 65 --lfsr_y 149
+BOX:        python ro_placement.py hola.xdc 1024 18 --main_strategy box --main_box 1 0 99 99 --replace
+RE-PLACE:   python ro_placement.py base.xdc base_right.xdc 32 18 --replace
+
+Each RO takes two vertically adjacent slices (Y and Y-1). Sites are claimed in an occupancy index, so
+overlapping ROs or slices outside the device are rejected before anything is written.
 """
-from typing import Iterator
+from typing import Dict, Iterator, List, Optional, Tuple
 import argparse
+import re
 from pathlib import Path
 from datetime import datetime
 
-def ro_lines(ro_idx: int, x: int, y: int, bel_offset_y: int, main_or_lfsr: str) -> Iterator[str]:
-    """Yield six BEL/LOC pairs for one RO."""
-    
-    bels  = ["D6LUT", "C6LUT", "B6LUT", "A6LUT", "D6LUT", "C6LUT"]
-    y_off = [0, 0, 0, 0, -1, -1] # These offsets are relative to the given Y coordinate for the slice
+# SLICE_X0Y0 - SLICE_X113Y149 on the xc7z020 (PYNQ-Z1/Z2)
+DEVICE_MAX_X = 113
+DEVICE_MAX_Y = 149
+MIN_Y = 50 # Lowest anchor Y of a column before it wraps
+
+BELS = ["D6LUT", "C6LUT", "B6LUT", "A6LUT", "D6LUT", "C6LUT"]
+Y_OFF = [0, 0, 0, 0, -1, -1] # These offsets are relative to the given Y coordinate for the slice
+
+HEADER = "\n# --- Generated by place_ros.py on {date} ---\n"
+# Lines written by this script, removed by --replace
+GENERATED_LINE = re.compile(r"^(# --- Generated by place_ros\.py|# GEN_ROS_\w+\[\d+\]$|set_property (BEL|LOC) .*\{GEN_ROS_)")
+
+def ro_template(main_or_lfsr: str) -> str:
+    """str.format template of the six BEL/LOC pairs of one RO, with {idx}, {x} and {y0}/{y1} fields."""
+    lines = [f"\n# GEN_ROS_{main_or_lfsr}[{{idx}}]\n"]
+    for lut_idx, (bel, dy) in enumerate(zip(BELS, Y_OFF), 1):
+        cell = f"{{{{GEN_ROS_{main_or_lfsr}[{{idx}}].RO_inst/aux_i_inferred_i_{lut_idx}}}}}"
+        lines.append(f"set_property BEL {bel} [get_cells {cell}]\n"
+                     f"set_property LOC SLICE_X{{x}}Y{{y{-dy}}} [get_cells {cell}]\n")
+    return "".join(lines)
+
+# --- Placement strategies: anchor (x, y) of every RO, in order ---
+
+def column_sites(x: int, y: int, min_y: int = MIN_Y) -> Iterator[Tuple[int, int]]:
+    """Down a column two slices at a time, then the column two X to the right from the top again."""
+    start_y = y
+    while True:
+        yield x, y
+        y -= 2 # Move to the next RO location (down 2 slices)
+        if y < min_y:
+            x += 2 # Move two X columns right
+            y = start_y # Reset Y to start of column
+
+def snake_sites(x: int, y: int, min_y: int = MIN_Y) -> Iterator[Tuple[int, int]]:
+    """Like column_sites, but every other column is filled bottom-up, so consecutive ROs stay adjacent."""
+    column = list(range(y, min_y - 1, -2)) or [y]
+    down = True
+    while True:
+        for row in (column if down else reversed(column)):
+            yield x, row
+        x += 2
+        down = not down
+
+def box_sites(x0: int, y0: int, x1: int, y1: int) -> Iterator[Tuple[int, int]]:
+    """Columns of the box (x0, y0) - (x1, y1), top to bottom and left to right; the box bounds both slices."""
+    for x in range(x0, x1 + 1, 2):
+        for y in range(y1, y0, -2):
+            yield x, y
+
+class SiteGrid:
+    """Occupancy index of SLICE sites: O(1) claim with collision and device bounds checks."""
+
+    def __init__(self, max_x: int = DEVICE_MAX_X, max_y: int = DEVICE_MAX_Y) -> None:
+        self.max_x = max_x
+        self.max_y = max_y
+        self.owner: Dict[Tuple[int, int], str] = {}
 
-    for lut_idx, (bel, dy) in enumerate(zip(bels, y_off), 1):
-        cell = f"{{GEN_ROS_{main_or_lfsr}[{ro_idx}].RO_inst/aux_i_inferred_i_{lut_idx}}}"
-        slice_xy = f"SLICE_X{x}Y{y + dy}"
-        yield (f"set_property BEL {bel} [get_cells {cell}]\n"
-               f"set_property LOC {slice_xy} [get_cells {cell}]\n")
+    def claim(self, x: int, y: int, cell: str) -> None:
+        sites = [(x, y + dy) for dy in sorted(set(Y_OFF), reverse=True)]
+        for sx, sy in sites:
+            if not (0 <= sx <= self.max_x and 0 <= sy <= self.max_y):
+                raise ValueError(f"{cell} needs SLICE_X{sx}Y{sy}, outside the device "
+                                 f"(SLICE_X0Y0 - SLICE_X{self.max_x}Y{self.max_y})")
+            if (sx, sy) in self.owner:
+                raise ValueError(f"{cell} needs SLICE_X{sx}Y{sy}, already taken by {self.owner[(sx, sy)]}")
+        for site in sites:
+            self.owner[site] = cell
+
+    def place(self, main_or_lfsr: str, n_ros: int, sites: Iterator[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Claims the first n_ros anchors of a strategy for GEN_ROS_<main_or_lfsr>[0 .. n_ros - 1]."""
+        placement = []
+        for ro_idx, (x, y) in zip(range(n_ros), sites):
+            self.claim(x, y, f"GEN_ROS_{main_or_lfsr}[{ro_idx}]")
+            placement.append((x, y))
+        if len(placement) < n_ros:
+            raise ValueError(f"Only {len(placement)} of {n_ros} GEN_ROS_{main_or_lfsr} ROs fit in the region")
+        return placement
+
+def render(placements: Dict[str, List[Tuple[int, int]]]) -> str:
+    """XDC text of every placed RO, preceded by the generation header."""
+    parts = [HEADER.format(date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))]
+    for main_or_lfsr, placement in placements.items():
+        template = ro_template(main_or_lfsr)
+        parts.extend(template.format(idx=ro_idx, x=x, y0=y, y1=y - 1) for ro_idx, (x, y) in enumerate(placement))
+    return "".join(parts)
+
+def strip_generated(text: str) -> Tuple[str, str]:
+    """Splits an XDC around its generated placement block: (before, after)."""
+    lines = text.splitlines(keepends=True)
+    generated = [i for i, line in enumerate(lines) if GENERATED_LINE.match(line)]
+    if not generated:
+        return text, ""
+    return "".join(lines[:generated[0]]).rstrip("\n") + "\n", "".join(lines[generated[-1] + 1:])
+
+def make_sites(strategy: str, x: int, y: int, min_y: int, box: Optional[List[int]]) -> Iterator[Tuple[int, int]]:
+    if strategy == "box":
+        if box is None:
+            raise ValueError("The box strategy needs its corners (X0 Y0 X1 Y1)")
+        return box_sites(*box)
+    return (snake_sites if strategy == "snake" else column_sites)(x, y, min_y)
 
 def main() -> None:
     ap = argparse.ArgumentParser(description="Generate XDC constraints for manual RO placement.")
-    ap.add_argument("xdc", type=Path, help="Path to the XDC file to append constraints to.")
+    ap.add_argument("xdc", type=Path, nargs="+", help="XDC file(s) to append constraints to.")
     ap.add_argument("n_ros_main", type=int, help="Number of main ring oscillators.")
     ap.add_argument("n_ros_lfsr", type=int, help="Number of LFSR ring oscillators.")
-    
-    # New arguments for customizable starting coordinates
+
+    # Starting coordinates of the column and snake strategies
     ap.add_argument("--main_x", type=int, default=37, help="Initial X-coordinate for main ROs.")
     ap.add_argument("--main_y", type=int, default=149, help="Initial Y-coordinate for main ROs.")
     ap.add_argument("--lfsr_x", type=int, default=37, help="Initial X-coordinate for LFSR ROs.")
     ap.add_argument("--lfsr_y", type=int, default=99, help="Initial Y-coordinate for LFSR ROs.")
+    ap.add_argument("--min_y", type=int, default=MIN_Y, help="Lowest Y-coordinate before a column wraps.")
+
+    ap.add_argument("--main_strategy", choices=["column", "snake", "box"], default="column")
+    ap.add_argument("--lfsr_strategy", choices=["column", "snake", "box"], default="column")
+    ap.add_argument("--main_box", type=int, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), help="Region of the main ROs.")
+    ap.add_argument("--lfsr_box", type=int, nargs=4, metavar=("X0", "Y0", "X1", "Y1"), help="Region of the LFSR ROs.")
+
+    ap.add_argument("--max_x", type=int, default=DEVICE_MAX_X, help="Largest SLICE X of the device.")
+    ap.add_argument("--max_y", type=int, default=DEVICE_MAX_Y, help="Largest SLICE Y of the device.")
+    ap.add_argument("--replace", action="store_true", help="Replace a previously generated placement instead of appending.")
 
     args = ap.parse_args()
 
-    # Get initial coordinates from arguments
-    main_start_x = args.main_x
-    main_start_y = args.main_y
-    lfsr_start_x = args.lfsr_x
-    lfsr_start_y = args.lfsr_y
-
-    with args.xdc.open("a") as f:
-        f.write(f"\n# --- Generated by place_ros.py on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ---\n")
-
-        # --- Main ROs Placement ---
-        x_main, y_main = main_start_x, main_start_y
-        for ro_idx in range(args.n_ros_main):
-            f.write(f"\n# GEN_ROS_MAIN[{ro_idx}]\n")
-            for line in ro_lines(ro_idx, x_main, y_main, 0, 'MAIN'):
-                f.write(line)
-
-            # Move to the next RO location (down 2 slices)
-            y_main -= 2
-            if y_main < (lfsr_start_y if 'LFSR' in locals() and lfsr_start_y < main_start_y else 50):
-                x_main += 2 # Move two X columns right
-                y_main = main_start_y # Reset Y to start of column
-
-        # --- LFSR ROs Placement ---
-        x_lfsr, y_lfsr = lfsr_start_x, lfsr_start_y
-        for ro_idx in range(args.n_ros_lfsr):
-            f.write(f"\n# GEN_ROS_LFSR[{ro_idx}]\n")
-            for line in ro_lines(ro_idx, x_lfsr, y_lfsr, 0, 'LFSR'):
-                f.write(line)
-
-            # Move to the next RO location (down 2 slices)
-            y_lfsr -= 2
-            if y_lfsr < 50:
-                x_lfsr += 2 # Move two X columns right
-                y_lfsr = lfsr_start_y # Reset Y to start of column
-
-    print("Done — constraints appended.")
+    # A column stops above the other group when that one starts further down
+    main_min_y = args.lfsr_y + 2 if args.lfsr_y < args.main_y else args.min_y
+    lfsr_min_y = args.main_y + 2 if args.main_y < args.lfsr_y else args.min_y
+
+    grid = SiteGrid(args.max_x, args.max_y)
+    try:
+        placements = {
+            "MAIN": grid.place("MAIN", args.n_ros_main, make_sites(args.main_strategy, args.main_x, args.main_y, main_min_y, args.main_box)),
+            "LFSR": grid.place("LFSR", args.n_ros_lfsr, make_sites(args.lfsr_strategy, args.lfsr_x, args.lfsr_y, lfsr_min_y, args.lfsr_box))
+        }
+    except ValueError as e:
+        ap.error(str(e))
+    block = render(placements)
+
+    for xdc in args.xdc:
+        if args.replace and xdc.exists():
+            before, after = strip_generated(xdc.read_text())
+            xdc.write_text(before + block + ("\n" + after if after.strip() else ""))
+        else:
+            with xdc.open("a") as f:
+                f.write(block)
+
+    print(f"Done — {args.n_ros_main + args.n_ros_lfsr} ROs placed in {len(args.xdc)} file(s).")
 
 if __name__ == "__main__":
     main()
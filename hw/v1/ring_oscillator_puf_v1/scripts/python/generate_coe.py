@@ -3,57 +3,20 @@
 #
 # Generates a .coe file for the ro_map BRAM.
 # Maps an LFSR value (0-495) to a pair of unique RO indices (0-31).
+# The mapping and the file writer are shared with the other versions in hw/common/scripts/python/ro_pair_map.py.
 #
 
-G_N_ROS_MAIN = 32
-LFSR_RANGE = 496
-BRAM_DEPTH = 512
-BRAM_WIDTH = 10
+import os
+import sys
 
-def get_indices(lfsr_val, n_ros):
-    if lfsr_val >= 496:
-        return 0, 0
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), *[".."] * 4, "common", "scripts", "python"))
+from ro_pair_map import G_N_ROS_MAIN, bram_geometry, n_pairs, write_init_file
 
-    g, s = 0, 0
-    sum_val = n_ros - 2
-    current_index = 0
-    found = False
-
-    for i in range(n_ros - 1):
-        if not found and lfsr_val >= current_index and lfsr_val <= current_index + sum_val:
-            g = i
-            s = lfsr_val - current_index
-            found = True
-            break
-        else:
-            current_index = current_index + sum_val + 1
-            sum_val = sum_val - 1
-
-    ro0_index = g
-    ro1_index = g + s + 1
-    return ro0_index, ro1_index
+LFSR_RANGE = n_pairs(G_N_ROS_MAIN)
+BRAM_DEPTH, BRAM_WIDTH = bram_geometry(G_N_ROS_MAIN)
 
 
 if __name__ == "__main__":
-    file_path = "ro_map_init.coe"
-    with open(file_path, "w") as f:
-        # Write .coe file header
-        f.write("MEMORY_INITIALIZATION_RADIX=2;\n")
-        f.write("MEMORY_INITIALIZATION_VECTOR=\n")
-
-        # Generate data for each address
-        for addr in range(BRAM_DEPTH):
-            ro0, ro1 = get_indices(addr, G_N_ROS_MAIN)
-
-            # Format the indices into a 10-bit binary string
-            # ro1 is MSB (bits 9-5), ro0 is LSB (bits 4-0)
-            binary_str = f"{ro1:05b}{ro0:05b}"
-
-            # Write to file
-            f.write(binary_str)
-            if addr == BRAM_DEPTH - 1:
-                f.write(";")
-            else:
-                f.write(",\n")
-
-    print(f"Successfully generated '{file_path}' with {BRAM_DEPTH} entries.")
\ No newline at end of file
+    file_path = sys.argv[1] if len(sys.argv) > 1 else "ro_map_init.coe"
+    write_init_file(file_path, G_N_ROS_MAIN, BRAM_DEPTH)
+    print(f"Successfully generated '{file_path}' with {BRAM_DEPTH} entries.")
@@ -0,0 +1,13 @@
+# _paths.py
+#
+# The board keeps the whole sw/ tree, and the board scripts share the loaders and file formats in
+# sw/src. Importing this module makes the `src` package importable, adding sw/ to sys.path once.
+# Setting PYTHONPATH to the sw/ directory does the same and makes this a no-op.
+
+import os
+import sys
+
+SW_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if SW_DIR not in sys.path:
+    sys.path.insert(0, SW_DIR)
@@ -0,0 +1,255 @@
+import time
+import numpy as np
+from response_bits import pack_response_words
+
+# AXI Regs v2 IP register map (register indices, byte offset = index * 4)
+LFSR_ROS_COUNTERS_REG = 0x00        # 0x00 - 0x11 : lfsr ros counters      [R]
+LFSR_REG_COUNT = 18
+MAIN_ROS_COUNTERS_REG = 0x12        # 0x12 - 0x31 : main ros counters      [R]
+MAIN_REG_COUNT = 32
+PUF_RESPONSE_REG = 0x32             # 0x32 - 0x35 : puf response           [R]
+PUF_RESPONSE_REG_COUNT = 4
+LFSR_ROS_CORRECTED_REG = 0x36       # 0x36        : lfsr ros corrected     [R/W]
+PUF_RESPONSE_CORRECTED_REG = 0x37   # 0x37 - 0x3A : puf response corrected [R/W]
+CONTROL_REG = 0x3B                  # 0x3B        : control reg
+N_REGS = 0x3C
+
+# Control register bits
+RESET_N_BIT_MASK = 1 << 0
+ENABLE_BIT_MASK = 1 << 1
+LFSR_ROS_COUNTERS_READY_BIT_MASK = 1 << 2
+MAIN_ROS_COUNTERS_READY_BIT_MASK = 1 << 3
+PUF_RESPONSE_READY_BIT_MASK = 1 << 4
+
+LFSR_WIDTH = LFSR_REG_COUNT // 2
+
+# One measurement, as read by AxiRegsV2Driver.measure()
+RECORD_DTYPE = np.dtype([
+    ('Timestamp', '<f8'),
+    ('LFSR_Ros_Counters', '<u4', (LFSR_REG_COUNT,)),
+    ('LFSR_Seed', '<u2'),
+    ('LFSR_Seed_Time', '<f8'),
+    ('LFSR_Seed_Vccint', '<f4'),
+    ('LFSR_Seed_Temperature', '<f4'),
+    ('Main_Ros_Counters', '<u4', (MAIN_REG_COUNT,)),
+    ('PUF_Response', 'u1', (PUF_RESPONSE_REG_COUNT * 4,)),
+    ('PUF_Response_Time', '<f8'),
+    ('PUF_Response_Vccint', '<f4'),
+    ('PUF_Response_Temperature', '<f4')
+])
+
+def lfsr_seed_from_counters(counters):
+    """
+    Seed bit i is 1 when RO 2i+1 is slower than RO 2i (pair 0 is the LSB), for one or many rows of counters.
+    """
+    counters = np.asarray(counters)
+    bits = counters[..., 1::2] < counters[..., 0::2]
+    return (bits.astype(np.uint16) << np.arange(bits.shape[-1], dtype=np.uint16)).sum(axis=-1, dtype=np.uint16)
+
+def to_capture_columns(records):
+    """
+    Columns for capture_file.CaptureWriter.append (seed as 9 packed bits, MSB first).
+    """
+    seed_bits = (records['LFSR_Seed'][:, None] >> np.arange(LFSR_WIDTH - 1, -1, -1)) & 1
+    return {
+        'Timestamp': records['Timestamp'],
+        'LFSR_Seed_Value': seed_bits.astype(np.uint8),
+        'LFSR_Seed_Vccint': records['LFSR_Seed_Vccint'],
+        'LFSR_Seed_Temperature': records['LFSR_Seed_Temperature'],
+        'PUF_Response_Value': records['PUF_Response'],
+        'PUF_Response_Vccint': records['PUF_Response_Vccint'],
+        'PUF_Response_Temperature': records['PUF_Response_Temperature']
+    }
+
+class AxiRegsV2Driver:
+    """
+    Acquisition driver for the axi_regs_v2 IP. mmio is anything with PYNQ MMIO's interface:
+    read(offset), write(offset, value) and array (uint32 view of the register window), e.g.
+    axi_regs_ip.mmio on the board or FakeAxiRegsV2 off-board.
+
+    Register ranges are copied out of the array view in one NumPy copy each, and ready bits are waited on
+    with a sleep sized from the previous waits, a short spin, then exponential backoff.
+    """
+    def __init__(self, mmio, read_vccint=None, read_temperature=None, correct_seed=None,
+                 reset_time=0.01, spin_polls=200, min_sleep=50e-6, max_sleep=10e-3, min_presleep=1e-3, timeout=5.0):
+        self.mmio = mmio
+        self.regs = mmio.array[:N_REGS]
+        self.read_vccint = read_vccint or (lambda: np.nan)
+        self.read_temperature = read_temperature or (lambda: np.nan)
+        # LFSR seed correction (e.g. the LFSR seed agent); the raw seed is written back by default
+        self.correct_seed = correct_seed or (lambda seed: seed)
+        self.reset_time = reset_time
+        self.spin_polls = spin_polls
+        self.min_sleep = min_sleep
+        self.max_sleep = max_sleep
+        # Waits shorter than this are cheaper to spin on than to sleep through (sleep granularity)
+        self.min_presleep = min_presleep
+        self.timeout = timeout
+        # Running estimate of every ready bit's wait, in seconds
+        self.expected_wait = {}
+
+    def read_reg(self, reg):
+        return self.mmio.read(reg * 4)
+
+    def write_reg(self, reg, value):
+        self.mmio.write(reg * 4, int(value))
+
+    def wait_ready(self, mask):
+        """
+        Waits until `mask` is set in the control register and returns the register value.
+        """
+        start = time.perf_counter()
+        expected = self.expected_wait.get(mask)
+        if expected and expected > self.min_presleep:
+            # Sleep through most of the usual wait instead of polling it
+            time.sleep(0.8 * expected)
+
+        polls = 0
+        sleep = self.min_sleep
+        while True:
+            control = self.read_reg(CONTROL_REG)
+            if control & mask:
+                break
+            polls += 1
+            if polls > self.spin_polls:
+                if time.perf_counter() - start > self.timeout:
+                    raise TimeoutError(f'Control register bit mask {mask:#x} not set after {self.timeout} s')
+                time.sleep(sleep)
+                sleep = min(2 * sleep, self.max_sleep)
+
+        elapsed = time.perf_counter() - start
+        self.expected_wait[mask] = elapsed if expected is None else 0.8 * expected + 0.2 * elapsed
+        return control
+
+    def read_environment(self):
+        return self.read_vccint(), self.read_temperature()
+
+    def measure(self, out=None):
+        """
+        One full LFSR seed + PUF response measurement, following the v2 handshake.
+        Fills `out` (a RECORD_DTYPE record, e.g. a row of a preallocated array) if given.
+        """
+        record = np.zeros((), dtype=RECORD_DTYPE) if out is None else out
+        record['Timestamp'] = time.time()
+
+        # --- System reset ---
+        self.write_reg(CONTROL_REG, 0)
+        if self.reset_time:
+            time.sleep(self.reset_time)
+        self.write_reg(CONTROL_REG, RESET_N_BIT_MASK)
+
+        # --- Phase 1: LFSR ROs counters ---
+        control = self.wait_ready(LFSR_ROS_COUNTERS_READY_BIT_MASK)
+        self.write_reg(CONTROL_REG, control & ~LFSR_ROS_COUNTERS_READY_BIT_MASK)
+        vccint1, temperature1 = self.read_environment()
+        record['LFSR_Seed_Time'] = time.time()
+        record['LFSR_Ros_Counters'] = self.regs[LFSR_ROS_COUNTERS_REG:LFSR_ROS_COUNTERS_REG + LFSR_REG_COUNT]
+        vccint2, temperature2 = self.read_environment()
+        record['LFSR_Seed_Vccint'] = (vccint1 + vccint2) / 2
+        record['LFSR_Seed_Temperature'] = (temperature1 + temperature2) / 2
+
+        seed = int(lfsr_seed_from_counters(record['LFSR_Ros_Counters']))
+        record['LFSR_Seed'] = seed
+        # Acknowledges the LFSR counters to ring_oscillator_puf_v2
+        self.write_reg(LFSR_ROS_CORRECTED_REG, self.correct_seed(seed))
+
+        # --- Phase 2: Main ROs counters ---
+        self.write_reg(CONTROL_REG, RESET_N_BIT_MASK | ENABLE_BIT_MASK)
+        control = self.wait_ready(MAIN_ROS_COUNTERS_READY_BIT_MASK)
+        self.write_reg(CONTROL_REG, control & ~MAIN_ROS_COUNTERS_READY_BIT_MASK)
+        vccint1, temperature1 = self.read_environment()
+        record['PUF_Response_Time'] = time.time()
+        record['Main_Ros_Counters'] = self.regs[MAIN_ROS_COUNTERS_REG:MAIN_ROS_COUNTERS_REG + MAIN_REG_COUNT]
+        vccint2, temperature2 = self.read_environment()
+        record['PUF_Response_Vccint'] = (vccint1 + vccint2) / 2
+        record['PUF_Response_Temperature'] = (temperature1 + temperature2) / 2
+
+        # --- Phase 3: 128-bit PUF response ---
+        self.wait_ready(PUF_RESPONSE_READY_BIT_MASK)
+        self.write_reg(CONTROL_REG, RESET_N_BIT_MASK)
+        record['PUF_Response'] = pack_response_words(self.regs[PUF_RESPONSE_REG:PUF_RESPONSE_REG + PUF_RESPONSE_REG_COUNT])[0]
+        return record
+
+    def measure_many(self, n, out=None):
+        records = np.zeros(n, dtype=RECORD_DTYPE) if out is None else out
+        for i in range(n):
+            self.measure(records[i])
+        return records
+
+    def close(self):
+        self.write_reg(CONTROL_REG, 0)
+
+class FakeAxiRegsV2:
+    """
+    In-process stand-in for the axi_regs_v2 MMIO window, for off-board tests and benchmarks.
+    It follows the register map and the ready/ack handshake of ring_oscillator_puf_v2: counters become
+    ready conversion_time seconds after reset_n is released (LFSR ROs) or after enable once the seed is
+    acknowledged (main ROs and response). Each RO has a fixed per-board count plus Gaussian jitter.
+
+    Response bits compare RO pairs given by response_pairs(seed) (by default a fixed random pair list
+    per seed), so a different pair model or a full simulator can be plugged in by overriding it.
+    """
+    def __init__(self, conversion_time=0.0, mean_count=30000, process_sigma=300, jitter_sigma=20, rng=None):
+        self.rng = rng or np.random.default_rng()
+        self.array = np.zeros(N_REGS, dtype=np.uint32)
+        self.conversion_time = conversion_time
+        self.jitter_sigma = jitter_sigma
+        self.lfsr_counts = self.rng.normal(mean_count, process_sigma, LFSR_REG_COUNT)
+        self.main_counts = self.rng.normal(mean_count, process_sigma, MAIN_REG_COUNT)
+        self.pair_rng_seed = int(self.rng.integers(1 << 31))
+        self.state = 'reset'
+        self.deadline = None
+
+    def response_pairs(self, seed):
+        rng = np.random.default_rng([self.pair_rng_seed, seed])
+        ro0 = rng.integers(0, MAIN_REG_COUNT, PUF_RESPONSE_REG_COUNT * 32)
+        ro1 = (ro0 + rng.integers(1, MAIN_REG_COUNT, ro0.size)) % MAIN_REG_COUNT
+        return ro0, ro1
+
+    def sample(self, counts):
+        return np.maximum(counts + self.rng.normal(0, self.jitter_sigma, counts.shape), 0)
+
+    def update(self):
+        if self.deadline is None or time.perf_counter() < self.deadline:
+            return
+        self.deadline = None
+        if self.state == 'lfsr_conversion':
+            self.array[LFSR_ROS_COUNTERS_REG:LFSR_ROS_COUNTERS_REG + LFSR_REG_COUNT] = self.sample(self.lfsr_counts)
+            self.array[CONTROL_REG] |= LFSR_ROS_COUNTERS_READY_BIT_MASK
+            self.state = 'wait_for_agent'
+        elif self.state == 'main_conversion':
+            ro0, ro1 = self.response_pairs(int(self.array[LFSR_ROS_CORRECTED_REG]))
+            # Every comparison is a fresh sample of both ROs; the registers keep each RO's last one
+            counts0, counts1 = self.sample(self.main_counts[ro0]), self.sample(self.main_counts[ro1])
+            self.array[MAIN_ROS_COUNTERS_REG + ro0] = counts0
+            self.array[MAIN_ROS_COUNTERS_REG + ro1] = counts1
+            bits = (counts0 > counts1).astype(np.uint8)
+            # Bit string order is word 3 ... word 0, MSB first
+            words = np.packbits(bits).view('>u4')[::-1]
+            self.array[PUF_RESPONSE_REG:PUF_RESPONSE_REG + PUF_RESPONSE_REG_COUNT] = words
+            self.array[CONTROL_REG] |= MAIN_ROS_COUNTERS_READY_BIT_MASK | PUF_RESPONSE_READY_BIT_MASK
+            self.state = 'response_ready'
+
+    def start(self, state):
+        self.state = state
+        self.deadline = time.perf_counter() + self.conversion_time
+
+    def read(self, offset):
+        self.update()
+        return int(self.array[offset // 4])
+
+    def write(self, offset, value):
+        reg = offset // 4
+        self.array[reg] = value
+        if reg == CONTROL_REG:
+            if not value & RESET_N_BIT_MASK:
+                self.state = 'reset'
+                self.deadline = None
+            elif self.state == 'reset':
+                self.start('lfsr_conversion')
+            elif self.state == 'seed_ready' and value & ENABLE_BIT_MASK:
+                self.start('main_conversion')
+        elif reg == LFSR_ROS_CORRECTED_REG and self.state == 'wait_for_agent':
+            self.state = 'seed_ready'
+            if self.array[CONTROL_REG] & ENABLE_BIT_MASK:
+                self.start('main_conversion')
@@ -0,0 +1,257 @@
+import os
+import threading
+import time
+import numpy as np
+from acquisition import RECORD_DTYPE, to_capture_columns
+
+import _paths # Makes sw/src importable
+from src.capture_file import CaptureWriter
+
+XADC_DEVICE_DIR = '/sys/bus/iio/devices/iio:device0'
+
+class XadcTelemetry:
+    """
+    Zynq XADC readings through the IIO sysfs files. The raw value files are opened once and re-read
+    with pread, and the scale/offset attributes are read only at start.
+    """
+    def __init__(self, device_dir=XADC_DEVICE_DIR):
+        self.device_dir = device_dir
+        self.temperature_scale = self.read_attribute('in_temp0_scale')
+        self.temperature_offset = self.read_attribute('in_temp0_offset')
+        self.vccint_scale = self.read_attribute('in_voltage0_vccint_scale')
+        self.temperature_fd = os.open(os.path.join(device_dir, 'in_temp0_raw'), os.O_RDONLY)
+        self.vccint_fd = os.open(os.path.join(device_dir, 'in_voltage0_vccint_raw'), os.O_RDONLY)
+
+    def read_attribute(self, name):
+        with open(os.path.join(self.device_dir, name)) as f:
+            return float(f.read())
+
+    def read_vccint(self):
+        return float(os.pread(self.vccint_fd, 32, 0)) * self.vccint_scale / 1000
+
+    def read_temperature(self):
+        return (float(os.pread(self.temperature_fd, 32, 0)) + self.temperature_offset) * self.temperature_scale / 1000
+
+    def close(self):
+        os.close(self.temperature_fd)
+        os.close(self.vccint_fd)
+
+def write_fake_xadc(device_dir, vccint=1.0, temperature=40.0, vccint_scale=0.732421875,
+                    temperature_scale=123.040771484, temperature_offset=-2219):
+    """
+    Writes (or updates) the XADC sysfs files XadcTelemetry reads, for off-board runs.
+    """
+    os.makedirs(device_dir, exist_ok=True)
+    values = {
+        'in_voltage0_vccint_scale': vccint_scale,
+        'in_temp0_scale': temperature_scale,
+        'in_temp0_offset': temperature_offset,
+        'in_voltage0_vccint_raw': round(vccint * 1000 / vccint_scale),
+        'in_temp0_raw': round(temperature * 1000 / temperature_scale - temperature_offset)
+    }
+    # Rewritten in place at a fixed width (no truncation), so a concurrent pread never sees an empty file
+    for name, value in values.items():
+        fd = os.open(os.path.join(device_dir, name), os.O_WRONLY | os.O_CREAT, 0o644)
+        os.pwrite(fd, f'{value:<31}\n'.encode(), 0)
+        os.close(fd)
+
+class TelemetrySampler(threading.Thread):
+    """
+    Samples Vccint/Temperature every `period` seconds into a fixed-size ring of (time, vccint, temperature),
+    so measurements can be matched to telemetry by timestamp instead of reading sysfs in the handshake.
+    """
+    def __init__(self, telemetry, period=0.005, capacity=4096):
+        super().__init__(daemon=True)
+        self.telemetry = telemetry
+        self.period = period
+        self.samples = np.full((capacity, 3), np.nan)
+        self.count = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def sample(self):
+        t = time.time()
+        row = (t, self.telemetry.read_vccint(), self.telemetry.read_temperature())
+        with self.lock:
+            self.samples[self.count % len(self.samples)] = row
+            self.count += 1
+
+    def run(self):
+        next_time = time.perf_counter()
+        while not self.stopped.is_set():
+            self.sample()
+            next_time += self.period
+            self.stopped.wait(max(0.0, next_time - time.perf_counter()))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def match(self, timestamps):
+        """
+        Vccint and Temperature linearly interpolated at `timestamps` from the samples still in the ring.
+        """
+        with self.lock:
+            n = min(self.count, len(self.samples))
+            start = self.count - n
+            window = np.roll(self.samples, -start % len(self.samples), axis=0)[:n]
+        if n == 0:
+            return np.full(len(timestamps), np.nan), np.full(len(timestamps), np.nan)
+        return np.interp(timestamps, window[:, 0], window[:, 1]), np.interp(timestamps, window[:, 0], window[:, 2])
+
+class RecordRing:
+    """
+    Fixed-size ring of measurement records shared by one producer and one consumer. The producer fills
+    slots in place and waits when the ring is full, so records are never overwritten or dropped.
+    """
+    def __init__(self, capacity, dtype=RECORD_DTYPE):
+        self.records = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.head = 0 # records produced
+        self.tail = 0 # records consumed
+        self.condition = threading.Condition()
+        self.full_waits = 0
+        self.closed = False # No more records will be committed
+
+    def reserve(self):
+        """
+        Returns the next free record, waiting for the consumer while the ring is full,
+        or None once the ring is closed.
+        """
+        with self.condition:
+            if self.head - self.tail >= self.capacity:
+                self.full_waits += 1
+                self.condition.wait_for(lambda: self.head - self.tail < self.capacity or self.closed)
+            if self.closed:
+                return None
+        return self.records[self.head % self.capacity]
+
+    def commit(self):
+        with self.condition:
+            self.head += 1
+            self.condition.notify_all()
+
+    def wait_batch(self, batch_size, timeout):
+        """
+        Waits for batch_size records (or timeout) and returns the contiguous ready slices (two on wrap-around).
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.head - self.tail >= batch_size or self.closed, timeout)
+            head = self.head
+        start, end = self.tail % self.capacity, self.tail % self.capacity + (head - self.tail)
+        if end <= self.capacity:
+            return [self.records[start:end]]
+        return [self.records[start:], self.records[:end - self.capacity]]
+
+    def release(self, n):
+        with self.condition:
+            self.tail += n
+            self.condition.notify_all()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+class CaptureDaemon:
+    """
+    Continuous capture: the hardware handshake runs on one thread (driver.measure into the ring),
+    telemetry on a timer thread, and a writer thread matches telemetry to the counter read times of each
+    batch and appends it to a binary capture file (see src/capture_file.py).
+    """
+    def __init__(self, driver, telemetry, capture_path, board_id=0, capacity=4096, batch_size=256,
+                 flush_interval=0.5, telemetry_period=0.005):
+        self.driver = driver
+        self.sampler = TelemetrySampler(telemetry, telemetry_period)
+        self.ring = RecordRing(capacity)
+        self.writer = CaptureWriter(capture_path, board_id)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stopped = threading.Event()
+        self.threads = []
+        self.captured = 0
+        self.written = 0
+        self.start_time = None
+        self.stop_time = None
+        self.error = None
+
+    def produce(self, n):
+        try:
+            while not self.stopped.is_set() and (n is None or self.captured < n):
+                record = self.ring.reserve()
+                if record is None:
+                    break
+                self.driver.measure(record)
+                self.ring.commit()
+                self.captured += 1
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.stop_time = time.perf_counter()
+            self.stopped.set()
+            # Every committed record is in the ring now, so the consumer can drain it and finish
+            self.ring.close()
+
+    def flush(self, records):
+        for section in ['LFSR_Seed', 'PUF_Response']:
+            vccint, temperature = self.sampler.match(records[f'{section}_Time'])
+            records[f'{section}_Vccint'] = vccint
+            records[f'{section}_Temperature'] = temperature
+        self.writer.append(to_capture_columns(records))
+        self.written += len(records)
+
+    def consume(self):
+        try:
+            while True:
+                done = self.ring.closed
+                for chunk in self.ring.wait_batch(self.batch_size, self.flush_interval):
+                    self.flush(chunk)
+                    self.ring.release(len(chunk))
+                if done and self.ring.head == self.ring.tail:
+                    break
+        except BaseException as e:
+            self.error = e
+            self.stopped.set()
+            # Wakes a producer waiting for room that will never come
+            self.ring.close()
+
+    def start(self, n=None):
+        """
+        Starts capturing n measurements (or until stop()) in the background.
+        """
+        self.start_time = time.perf_counter()
+        self.sampler.start()
+        # Let the first telemetry samples in before the first measurement needs them
+        time.sleep(self.sampler.period)
+        self.threads = [threading.Thread(target=self.produce, args=(n,), daemon=True),
+                        threading.Thread(target=self.consume, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+        self.sampler.stop()
+        self.writer.close()
+        self.driver.close()
+        if self.error is not None:
+            raise self.error
+
+    def run(self, n):
+        self.start(n)
+        self.join()
+        return self.stats()
+
+    def stats(self):
+        elapsed = (self.stop_time or time.perf_counter()) - self.start_time
+        return {
+            'captured': self.captured,
+            'written': self.written,
+            'elapsed': elapsed,
+            'captures_per_second': self.captured / elapsed if elapsed > 0 else 0.0,
+            'ring_full_waits': self.ring.full_waits
+        }
@@ -0,0 +1,114 @@
+import json
+import os
+import numpy as np
+
+import _paths # Makes sw/src importable
+from src.capture_file import is_capture_file, open_capture
+from response_bits import pack_response_words
+
+NORMALIZATION_FILE = 'normalization.json'
+
+# Row b holds the 8 bits of byte b, MSB first, as float32 network inputs
+_BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).astype(np.float32)
+
+def unlock_key(packed_key):
+    """
+    Splits a packed 128-bit key into the 8 16-bit integers expected by unlock_weights.
+    """
+    return np.ascontiguousarray(packed_key, dtype=np.uint8).view('>u2').astype(int).tolist()
+
+def compute_normalization(data_path, out_path, section='PUF_Response'):
+    """
+    One-time pass over a capture (CSV or binary capture file) storing the Vccint/Temperature min/max
+    used for training into a small JSON sidecar, so the board never has to read the capture again.
+    """
+    if is_capture_file(data_path):
+        capture = open_capture(data_path)
+        vccint, temperature = capture[f'{section}_Vccint'], capture[f'{section}_Temperature']
+    else:
+        import pandas as pd
+        df = pd.read_csv(data_path, usecols=[f'{section}_Vccint', f'{section}_Temperature'])
+        vccint = pd.to_numeric(df[f'{section}_Vccint'], errors='coerce')
+        temperature = pd.to_numeric(df[f'{section}_Temperature'], errors='coerce')
+
+    normalization = {
+        'section': section,
+        'vccint_min': float(vccint.min()), 'vccint_max': float(vccint.max()),
+        'temperature_min': float(temperature.min()), 'temperature_max': float(temperature.max())
+    }
+    with open(out_path, 'w') as f:
+        json.dump(normalization, f, indent=2)
+    return normalization
+
+class CorrectionAgent:
+    """
+    PUF response correction network (130 -> 256 -> 256 -> 128, ReLU hidden layers) kept loaded on the board.
+    Inputs are packed 128-bit responses plus raw Vccint/Temperature; outputs are packed 128-bit keys
+    (logit > threshold). The normalization is folded into the first layer and all activations live in
+    preallocated float32 buffers, so a call is three matmuls and no Python-level work per bit.
+    """
+    def __init__(self, weights_dir, normalization_path=None, prefix='puf_response_mlp_agent', batch_size=64, threshold=0.0):
+        w1, w2, w3 = [np.load(os.path.join(weights_dir, f'{prefix}_w{i}.npy')).astype(np.float32) for i in range(1, 4)]
+        b1, b2, b3 = [np.load(os.path.join(weights_dir, f'{prefix}_b{i}.npy')).astype(np.float32).reshape(-1) for i in range(1, 4)]
+
+        with open(normalization_path or os.path.join(weights_dir, NORMALIZATION_FILE)) as f:
+            normalization = json.load(f)
+        # Training input is [(v - v_min) / v_range, (t - t_min) / t_range, bits...]
+        scale = np.array([1 / (normalization['vccint_max'] - normalization['vccint_min']),
+                          1 / (normalization['temperature_max'] - normalization['temperature_min'])], dtype=np.float32)
+        offset = -np.array([normalization['vccint_min'], normalization['temperature_min']], dtype=np.float32) * scale
+
+        # Input buffer layout is [bits (128) | vccint | temperature], so the bits can be filled with one gather;
+        # the first layer's rows are reordered to match, with the env normalization folded in.
+        self.w1 = np.ascontiguousarray(np.vstack([w1[2:], w1[:2] * scale[:, None]]))
+        self.b1 = b1 + offset @ w1[:2]
+        self.w2, self.b2 = np.ascontiguousarray(w2), b2
+        self.w3, self.b3 = np.ascontiguousarray(w3), b3
+        self.n_bits = w3.shape[1]
+        self.threshold = threshold
+        self.allocate(batch_size)
+
+    def allocate(self, batch_size):
+        self.batch_size = batch_size
+        self.x = np.empty((batch_size, self.w1.shape[0]), dtype=np.float32)
+        self.h1 = np.empty((batch_size, self.w1.shape[1]), dtype=np.float32)
+        self.h2 = np.empty((batch_size, self.w2.shape[1]), dtype=np.float32)
+        self.logits = np.empty((batch_size, self.w3.shape[1]), dtype=np.float32)
+        self.key_bits = np.empty((batch_size, self.w3.shape[1]), dtype=bool)
+
+    def forward(self, packed, vccint, temperature):
+        """
+        Logits for n <= batch_size responses, as a view into the reused output buffer.
+        """
+        n = packed.shape[0]
+        x = self.x[:n]
+        np.take(_BYTE_BITS, packed, axis=0, out=x[:, :self.n_bits].reshape(n, -1, 8))
+        x[:, self.n_bits] = vccint
+        x[:, self.n_bits + 1] = temperature
+
+        h1, h2, logits = self.h1[:n], self.h2[:n], self.logits[:n]
+        np.matmul(x, self.w1, out=h1)
+        h1 += self.b1
+        np.maximum(h1, 0, out=h1)
+        np.matmul(h1, self.w2, out=h2)
+        h2 += self.b2
+        np.maximum(h2, 0, out=h2)
+        np.matmul(h2, self.w3, out=logits)
+        logits += self.b3
+        return logits
+
+    def correct(self, packed, vccint, temperature):
+        """
+        Corrected keys for a batch of packed responses ((n, 16) uint8, see pack_response_words),
+        returned packed as (n, 16) uint8.
+        """
+        packed = np.atleast_2d(np.asarray(packed, dtype=np.uint8))
+        vccint = np.broadcast_to(np.asarray(vccint, dtype=np.float32), packed.shape[:1])
+        temperature = np.broadcast_to(np.asarray(temperature, dtype=np.float32), packed.shape[:1])
+        if packed.shape[0] > self.batch_size:
+            self.allocate(packed.shape[0])
+
+        logits = self.forward(packed, vccint, temperature)
+        key_bits = self.key_bits[:packed.shape[0]]
+        np.greater(logits, self.threshold, out=key_bits)
+        return np.packbits(key_bits, axis=1)
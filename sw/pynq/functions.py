@@ -3,7 +3,10 @@ from PIL import Image
 import os
 from os.path import isdir, join
 import struct
-from array import array
+import json
+
+import _paths # Makes sw/src importable
+from src.mnist import MNIST
 
 def relu(x):
     """Applies the ReLU activation function."""
@@ -18,44 +21,48 @@ def softmax(x):
 def unlock_weights(weights_dict, key):
     """
     Reverses the permutations applied to the weight matrices.
+    Permutations are kept as index arrays (P == np.eye(n)[indices]), so no dense matrices are built.
     """
     unlocked_weights = {}
-    permutation_matrices = []
+    permutations = []
 
-    # --- Loop 1: Generate and STORE the permutation matrices ---
+    # --- Loop 1: Generate and STORE the permutation indices ---
     for i in range(4):
         W_shape = weights_dict[f"W{i+1}"].shape
 
-        # Generate P_row
-        np.random.seed(key[2 * i])
-        P_row = np.eye(W_shape[0])
-        np.random.shuffle(P_row)
-        permutation_matrices.append(P_row)
-
-        # Generate P_col
-        np.random.seed(key[2 * i + 1])
-        P_col = np.eye(W_shape[1])
-        np.random.shuffle(P_col)
-        permutation_matrices.append(P_col)
+        # Same row order as np.random.seed(key) + np.random.shuffle(np.eye(n))
+        permutations.append(np.random.RandomState(key[2 * i]).permutation(W_shape[0]))
+        permutations.append(np.random.RandomState(key[2 * i + 1]).permutation(W_shape[1]))
 
     # --- Loop 2: Apply the inverse permutations ---
     for i in range(4):
         W_locked = weights_dict[f"W{i+1}"]
-        # Retrieve the correct matrices from the list
-        P_row = permutation_matrices[2 * i]
-        P_col = permutation_matrices[2 * i + 1]
+        # Retrieve the correct permutations from the list
+        P_row = permutations[2 * i]
+        P_col = permutations[2 * i + 1]
         
-        # Perform inverse matrix multiplications using the transpose
-        temp_W = np.dot(P_row.T, W_locked)
-        unlocked_W = np.dot(temp_W, P_col.T)
+        # P_row.T @ W_locked @ P_col.T as index remaps
+        temp_W = np.take(W_locked, np.argsort(P_row), axis=0)
+        unlocked_W = np.take(temp_W, P_col, axis=1)
         unlocked_weights[f"W{i+1}"] = unlocked_W
     
     return unlocked_weights
 
+def check_float_weights(weights):
+    """
+    Rejects integer (int8 quantized) weights, which give wrong results without their scales.
+    load_model_container dequantizes them on load.
+    """
+    for w in weights:
+        if np.asarray(w).dtype.kind != 'f':
+            raise ValueError(f'Expected float weights, got {np.asarray(w).dtype}: dequantize quantized models '
+                             'first (see load_model_container)')
+
 def forward_pass_mnist(x_test, w1, b1, w2, b2, w3, b3, w_out, b_out):
     """
     Performs a forward pass through the FULL 4-layer neural network.
     """
+    check_float_weights([w1, w2, w3, w_out])
     # Layer 1
     Z1 = np.dot(x_test, w1) + b1
     A1 = relu(Z1)
@@ -75,6 +82,32 @@ def forward_pass_mnist(x_test, w1, b1, w2, b2, w3, b3, w_out, b_out):
     return Y_pred
 
 
+def forward_pass_mnist_locked(x_test, w1, b1, w2, b2, w3, b3, w_out, b_out, key):
+    """
+    Performs the forward pass directly on row/column permutation locked weights.
+    Instead of unlocking, the inverse permutations are applied to the activations
+    (permute the input, un-permute the output), so the unlocked weights never exist.
+    """
+    weights = [w1, w2, w3, w_out]
+    biases = [b1, b2, b3, b_out]
+    check_float_weights(weights)
+    A = x_test
+    pending = None # Output column order owed by the previous layer
+
+    for i in range(4):
+        P_row = np.random.RandomState(key[2 * i]).permutation(weights[i].shape[0])
+        P_col = np.random.RandomState(key[2 * i + 1]).permutation(weights[i].shape[1])
+
+        # Fuse the previous layer's output un-permute with this layer's input permute
+        gather = P_row if pending is None else pending[P_row]
+        Z = np.dot(np.take(A, gather, axis=1), weights[i]) + np.take(biases[i], np.argsort(P_col), axis=-1)
+        A = relu(Z) if i < 3 else Z
+        pending = P_col
+
+    Y_pred = softmax(np.take(A, pending, axis=1))
+    
+    return Y_pred
+
 
 def forward_pass_puf_response(x_test, w1, b1, w2, b2, w_out, b_out):
     """
@@ -87,53 +120,42 @@ def forward_pass_puf_response(x_test, w1, b1, w2, b2, w_out, b_out):
     Z_out = np.dot(A2, w_out) + b_out # Uses w_out and b_out
     return Z_out
 
-class MNISTDataLoader(object):
+def load_model_container(path):
+    """
+    Opens a single-file model container (see src/model_container.py) with one copy-on-write
+    memory map. Returns (weights, biases, manifest); arrays are paged in on first use.
+    int8 quantized weights are dequantized to float32 once here with their stored per-layer scales
+    (the container stays 4x smaller to ship); AES locked ones are left as stored.
+    """
+    with open(path, 'rb') as file:
+        magic, manifest_length = struct.unpack("<8sQ", file.read(16))
+        if magic != b'PUFMLP01':
+            raise ValueError(f'Magic number mismatch for model container, expected PUFMLP01, got {magic}')
+        manifest = json.loads(file.read(manifest_length))
+
+    data_start = (16 + manifest_length + 63) // 64 * 64
+    buffer = np.memmap(path, dtype=np.uint8, mode='c')
+
+    arrays = {}
+    for name, section in manifest['sections'].items():
+        start = data_start + section['offset']
+        arrays[name] = buffer[start:start + section['nbytes']].view(np.dtype(section['dtype'])).reshape(section['shape'])
+
+    weights = {name: arrays[name] for name in manifest['weights']}
+    biases = {name: arrays[name] for name in manifest['biases']}
+    for name, scale in manifest['metadata'].get('scales', {}).items():
+        if manifest['sections'][name]['original_dtype'] is None:
+            weights[name] = np.multiply(weights[name], np.float32(scale), dtype=np.float32)
+    return weights, biases, manifest
+
+class MNISTDataLoader(MNIST):
+    """
+    Test split only: the shared memory-mapped IDX loader from src/mnist.py without the training set.
+    """
     def __init__(self, training_images_filepath, training_labels_filepath,
                  test_images_filepath, test_labels_filepath):
-        self.training_images_filepath = training_images_filepath
-        self.training_labels_filepath = training_labels_filepath
-        self.test_images_filepath = test_images_filepath
-        self.test_labels_filepath = test_labels_filepath
-
-        self.x_train = None
-        self.x_test = None
-        self.y_train = None
-        self.y_test = None
-
-        self.load_data()
-
-    def read_images_labels(self, images_filepath, labels_filepath):
-        labels = []
-        with open(labels_filepath, 'rb') as file:
-            magic, size = struct.unpack(">II", file.read(8))
-            if magic != 2049:
-                raise ValueError(f'Magic number mismatch for labels, expected 2049, got {magic}')
-            labels = array("B", file.read())
-
-        with open(images_filepath, 'rb') as file:
-            magic, size, rows, cols = struct.unpack(">IIII", file.read(16))
-            if magic != 2051:
-                raise ValueError(f'Magic number mismatch for images, expected 2051, got {magic}')
-            image_data = array("B", file.read())
-
-        images = np.frombuffer(image_data, dtype=np.uint8).reshape(size, rows * cols)
-        return images, np.array(labels)
-
-    def load_data(self):
-        # We only need test data for this script, but keeping structure for consistency
-        x_test_raw, y_test_raw = self.read_images_labels(self.test_images_filepath, self.test_labels_filepath)
-
-        # Normalize images to range [0, 1]
-        self.x_test = x_test_raw.astype(np.float32) / 255.0
-
-        # One-hot encode labels
-        num_classes = 10 
-        self.y_test = np.zeros((y_test_raw.size, num_classes))
-        self.y_test[np.arange(y_test_raw.size), y_test_raw] = 1
-        
-        print(f"MNIST Test Data loaded and processed:")
-        print(f"  x_test shape: {self.x_test.shape}, dtype: {self.x_test.dtype}")
-        print(f"  y_test shape: {self.y_test.shape}, dtype: {self.y_test.dtype}")
+        super().__init__(training_images_filepath, training_labels_filepath,
+                         test_images_filepath, test_labels_filepath, load_train=False)
 
 def calculate_accuracy(predicted_labels, true_labels):
     """
@@ -0,0 +1,12 @@
+import numpy as np
+
+# NumPy-only helpers shared by the register driver (acquisition.py) and the correction agent, so the
+# acquisition path does not load pandas or the capture format.
+
+def pack_response_words(words):
+    """
+    Packs the 32-bit PUF response registers (0x32 - 0x35, least significant word first) into
+    16 bytes per response, MSB first, i.e. the bytes of the response bit string as stored in captures.
+    """
+    words = np.atleast_2d(np.asarray(words, dtype=np.uint32))
+    return np.ascontiguousarray(words[:, ::-1]).astype('>u4').view(np.uint8)
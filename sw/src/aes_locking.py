@@ -0,0 +1,106 @@
+# aes_locking.py
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+CHUNK_SIZE = 1 << 20 # Bytes processed per cipher call
+
+def check_key(key):
+    if not isinstance(key, bytes) or len(key) != 16:
+        raise ValueError("AES-128 key must be 16 bytes long.")
+
+def writable_buffer(array, inplace=False):
+    '''
+    With inplace, returns the array itself when it can be ciphered in place (otherwise a C-contiguous
+    writable copy). Without, always returns a C-contiguous copy, so the caller's array is never modified.
+    '''
+    if not inplace:
+        return np.array(array, order='C', copy=True)
+    return np.require(array, requirements=['C_CONTIGUOUS', 'WRITEABLE'])
+
+def aes_ctr_inplace(array, key, nonce, chunk_size=CHUNK_SIZE):
+    '''
+    Applies the AES-128-CTR keystream to the array's own buffer in fixed-size chunks.
+    In CTR mode encryption and decryption are the same operation.
+    '''
+    cipher = Cipher(algorithms.AES(key), modes.CTR(nonce))
+    encryptor = cipher.encryptor()
+    buffer = memoryview(array).cast('B')
+
+    for start in range(0, len(buffer), chunk_size):
+        chunk = buffer[start:start + chunk_size]
+        try:
+            encryptor.update_into(chunk, chunk)
+        except ValueError:
+            # Older cryptography releases need block_size - 1 bytes of headroom in the output buffer
+            chunk[:] = encryptor.update(chunk)
+    encryptor.finalize()
+    return array
+
+def lock_weights(weights, key, chunk_size=CHUNK_SIZE, max_workers=None, inplace=False):
+    '''
+    Encrypts every weight matrix, one layer per worker thread (the cipher releases the GIL).
+    Returns the locked weights plus the per-layer nonces and dtypes needed to unlock them.
+    By default the weights are encrypted into new arrays. With inplace=True the caller's writable,
+    C-contiguous arrays are encrypted in their own buffers and returned, which saves a copy of the
+    model but corrupts every other reference to them.
+    '''
+    check_key(key)
+    locked = {name: writable_buffer(weight_matrix, inplace) for name, weight_matrix in weights.items()}
+    nonces = {name: os.urandom(16) for name in locked}
+    dtypes = {name: weight_matrix.dtype for name, weight_matrix in locked.items()}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda name: aes_ctr_inplace(locked[name], key, nonces[name], chunk_size), locked))
+
+    return locked, nonces, dtypes
+
+def unlock_weights(weights, key, nonces, chunk_size=CHUNK_SIZE, max_workers=None, inplace=False):
+    '''
+    Decrypts every weight matrix using the nonces stored at lock time, into new arrays by default
+    or in the caller's buffers with inplace=True (see lock_weights).
+    '''
+    check_key(key)
+    for name in weights:
+        if nonces.get(name) is None:
+            raise RuntimeError(f"Nonce for {name} not found. Model might not be locked correctly.")
+    unlocked = {name: writable_buffer(weight_matrix, inplace) for name, weight_matrix in weights.items()}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda name: aes_ctr_inplace(unlocked[name], key, nonces[name], chunk_size), unlocked))
+
+    return unlocked
+
+def decrypt_file_into(file, out, key, nonce, chunk_size=CHUNK_SIZE):
+    '''
+    Streams ciphertext from an open binary file (from its current position) straight into the
+    preallocated array and decrypts it chunk by chunk, so no intermediate copies are made.
+    '''
+    check_key(key)
+    buffer = memoryview(out).cast('B')
+
+    for start in range(0, len(buffer), chunk_size):
+        chunk = buffer[start:start + chunk_size]
+        if file.readinto(chunk) != len(chunk):
+            raise ValueError(f"Locked file ended before {len(buffer)} bytes were read.")
+
+    return aes_ctr_inplace(out, key, nonce, chunk_size)
+
+def load_locked_npy(path, key, nonce, chunk_size=CHUNK_SIZE):
+    '''
+    Loads an AES locked .npy weight file and decrypts it into a freshly allocated array.
+    '''
+    with open(path, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+        # Fortran ordered data is the C ordered transpose on disk
+        out = np.empty(shape[::-1] if fortran_order else shape, dtype=dtype)
+        decrypt_file_into(f, out, key, nonce, chunk_size)
+
+    return out.T if fortran_order else out
@@ -1,27 +1,106 @@
+import threading
+import weakref
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
 from mpl_toolkits.mplot3d import Axes3D
 from scipy.interpolate import griddata
+from scipy.special import entr
+from src.bit_matrix import BitMatrix
+from src.capture_file import Capture
+from src import inter_hamming as ih
 
 # ==============================================================================
 # 1. ANALYSIS FUNCTIONS
 # ==============================================================================
 
+# Bit statistics cache: id(df) -> (weakref to df, {column_name: (column token, statistics)})
+# Entries go away with their DataFrame, and are recomputed when the column is reassigned.
+# In-place edits of a response column are not detected: call clear_bit_statistics_cache().
+# The lock makes the cache safe for the threads of data_preprocessing_2.preprocess_csv.
+_bit_statistics_cache = {}
+_bit_statistics_lock = threading.RLock()
+
+def clear_bit_statistics_cache():
+    with _bit_statistics_lock:
+        _bit_statistics_cache.clear()
+
+def _column_token(df, column_name):
+    """
+    (key, pinned object) identifying the data of a DataFrame column across accesses.
+    NumPy-backed columns (object dtype from read_csv(dtype=str)) get a new wrapper and view on every
+    access, so they are keyed by the memory they point to, kept alive by pinning the view.
+    """
+    values = df[column_name].array
+    if isinstance(values, pd.arrays.NumpyExtensionArray):
+        data = values.to_numpy()
+        return (data.__array_interface__['data'][0], data.shape, data.strides, data.dtype.str), data
+    return id(values), values
+
+def bit_statistics(df, column_name):
+    """
+    Single pass over a response column: the per-bit one-counts of its packed bit matrix give the
+    majority ideal value, the per-bit flip rates against it and the bit-wise bias and entropy.
+    The result is cached per (DataFrame, column), so every analysis/plot of the column reuses it.
+    df may also be a binary capture (see capture_file.py), whose packed responses are used as they are.
+    """
+    # Captures are read-only snapshots, so only DataFrame columns can be reassigned under the cache
+    token = _column_token(df, column_name) if isinstance(df, pd.DataFrame) else (None, None)
+    key = id(df)
+
+    def forget(_):
+        with _bit_statistics_lock:
+            _bit_statistics_cache.pop(key, None)
+
+    with _bit_statistics_lock:
+        entry = _bit_statistics_cache.get(key)
+        if entry is None or entry[0]() is not df:
+            entry = (weakref.ref(df, forget), {})
+            _bit_statistics_cache[key] = entry
+        cached = entry[1].get(column_name)
+        if cached is not None and cached[0][0] == token[0]:
+            return cached[1]
+
+    bits = df.bit_matrix(column_name) if isinstance(df, Capture) else BitMatrix.from_column(df, column_name)
+    num_responses = len(bits)
+    ones = bits.bit_counts()
+    # Ties go to '0', as with mode()[0]
+    ideal_bits = (ones > num_responses - ones).astype(np.uint8)
+    flip_counts = np.where(ideal_bits == 1, num_responses - ones, ones)
+
+    # Bit positions are 1-based (MSB first)
+    positions = range(1, bits.n_bits + 1)
+    bias = ones / num_responses
+    entropy = (entr(bias) + entr(1 - bias)) / np.log(2)
+
+    statistics = {
+        'bits': bits,
+        'num_responses': num_responses,
+        'ones': ones,
+        'ideal_value': bytes(ideal_bits + ord('0')).decode('ascii'),
+        'flip_counts': flip_counts,
+        'flip_rates': pd.Series(flip_counts / num_responses, index=positions),
+        'bias': pd.Series(bias, index=positions),
+        'entropy': pd.Series(entropy, index=positions)
+    }
+    with _bit_statistics_lock:
+        entry[1][column_name] = (token, statistics)
+    return statistics
+
+def get_bit_matrix(df, column_name):
+    """
+    Returns the packed bit matrix (see bit_matrix.py) of a response column.
+    """
+    return bit_statistics(df, column_name)['bits']
+
 def calculate_intra_hamming_distances(df, column_name, ideal_value):
     """
     Calculates the Hamming distance for each response compared to an ideal value.
     Returns a pandas Series containing the distance for each row.
     """
-    responses_str = df[column_name].astype(str)
-    
-    # Convert strings to numpy arrays of integers for fast comparison
-    int_arrays = np.array([list(map(int, r)) for r in responses_str])
-    ideal_array = np.array(list(map(int, ideal_value)))
-    
-    # Calculate Hamming distance for each row using vectorized XOR and sum
-    distances = np.sum(int_arrays ^ ideal_array, axis=1)
+    # XOR + popcount on the packed responses
+    distances = get_bit_matrix(df, column_name).hamming_to(ideal_value)
     
     return pd.Series(distances, index=df.index)
 
@@ -29,10 +108,10 @@ def analyze_bit_proportions(df, column_name):
     '''
     Analyzes bit proportions for a given column of a Pandas Dataframe.
     '''
-    series = df[column_name].astype(str)
-    zeros_per_row = series.str.count('0')
-    ones_per_row = series.str.count('1')
-    length_per_row = series.str.len()
+    bits = get_bit_matrix(df, column_name)
+    ones_per_row = pd.Series(bits.ones_per_row(), index=df.index)
+    length_per_row = pd.Series(bits.n_bits, index=df.index)
+    zeros_per_row = length_per_row - ones_per_row
     zeroes_proportions_per_row = zeros_per_row / length_per_row
     ones_proportions_per_row = ones_per_row / length_per_row
     total_length = length_per_row.sum()
@@ -70,23 +149,21 @@ def get_ideal_value(df, column_name):
     '''
     Finds the most common bit at each position to create an "ideal" value.
     '''
-    series = df[column_name].astype(str)
-    series_as_df = series.str.split('', expand=True)
-    bits_df = series_as_df.iloc[:, 1:-1]
-    ideal_value_list = [bits_df[column].mode()[0] for column in bits_df.columns]
-    return "".join(ideal_value_list)
+    return bit_statistics(df, column_name)['ideal_value']
 
 def analyze_bit_stability(df, column_name, ideal_value_str):
     '''
     Analyzes the stability of each bit compared to an ideal value.
     '''
-    series = df[column_name].astype(str)
-    series_as_df = series.str.split('', expand=True)
-    bits_df = series_as_df.iloc[:, 1:-1]
-    ideal_value_list = list(ideal_value_str)
-    bit_flips = (bits_df != ideal_value_list)
-    bit_flips_count = bit_flips.sum(axis=0)
-    flip_percentages = bit_flips_count / len(df)
+    statistics = bit_statistics(df, column_name)
+    if ideal_value_str == statistics['ideal_value']:
+        flip_percentages = statistics['flip_rates']
+    else:
+        ones = statistics['ones']
+        num_responses = statistics['num_responses']
+        ideal_bits = np.frombuffer(ideal_value_str.encode('ascii'), dtype=np.uint8) - ord('0')
+        bit_flips_count = np.where(ideal_bits == 1, num_responses - ones, ones)
+        flip_percentages = pd.Series(bit_flips_count / num_responses, index=statistics['flip_rates'].index)
     return flip_percentages.sort_values(ascending=False)
 
 def get_formatted_stability(df, column, ideal_value):
@@ -141,14 +218,10 @@ def plot_stability_heatmap(df, column_name, ideal_value):
     Creates a heatmap to visualize the stability of each bit across all runs.
     White areas are stable, colored areas are "flips".
     """
-    series = df[column_name].astype(str)
-    
-    # Split into a DataFrame of bits
-    bits_df = series.str.split('', expand=True).iloc[:, 1:-1]
+    bits = get_bit_matrix(df, column_name)
     
     # Create a boolean DataFrame of flips (True where bits differ)
-    ideal_list = list(ideal_value)
-    flips_df = (bits_df != ideal_list)
+    flips_df = pd.DataFrame(bits.flips(ideal_value), index=df.index, columns=range(1, bits.n_bits + 1))
 
     # Plotting
     plt.figure(figsize=(15, 8))
@@ -158,34 +231,32 @@ def plot_stability_heatmap(df, column_name, ideal_value):
     plt.ylabel('Measurement Run Index')
     plt.show()
 
-def plot_inter_hamming_distribution(df, column_name, samples=10000):
+def plot_inter_hamming_distribution(df, column_name, samples=10000, exact=False):
     """
     Calculates and plots the distribution of Hamming distances between
-    random pairs of responses to evaluate uniqueness.
+    pairs of responses to evaluate uniqueness. By default random pairs are sampled
+    and the mean is reported with a 95% confidence interval; exact=True uses all pairs.
     """
-    responses = df[column_name].astype(str).to_numpy()
-    num_responses = len(responses)
-    bit_length = len(responses[0])
-
-    max_pairs = num_responses * (num_responses - 1) // 2
-    if samples > max_pairs:
-        samples = max_pairs
+    bits = get_bit_matrix(df, column_name)
+    num_responses = len(bits)
+    bit_length = bits.n_bits
 
-    # Convert strings to numpy arrays of integers for fast comparison
-    int_arrays = np.array([list(map(int, r)) for r in responses])
-    
-    distances = []
-    for _ in range(samples):
-        # Choose two different random indices
-        idx1, idx2 = np.random.choice(num_responses, 2, replace=False)
-        
-        # Calculate Hamming distance using vectorized XOR and sum
-        distance = np.sum(int_arrays[idx1] ^ int_arrays[idx2])
-        distances.append(distance)
-        
-    # Plotting the histogram
     plt.figure(figsize=(10, 6))
-    plt.hist(distances, bins=range(bit_length + 1), density=True, alpha=0.75, label='Measured Distribution')
+    if exact:
+        # Exact histogram over all N*(N-1)/2 pairs (blocked XOR/popcount)
+        histogram = ih.inter_hamming_histogram(bits)
+        mean = ih.histogram_mean(histogram, bit_length)
+        print(f"Exact mean inter-Hamming distance over {histogram.sum()} pairs: {mean * 100:.2f}%")
+        plt.bar(range(bit_length + 1), histogram / histogram.sum(), width=1.0, align='edge', alpha=0.75, label='Exact Distribution')
+    else:
+        max_pairs = num_responses * (num_responses - 1) // 2
+        if samples > max_pairs:
+            samples = max_pairs
+
+        distances = ih.sample_inter_hamming(bits, samples)
+        mean, (low, high) = ih.mean_confidence_interval(distances, bit_length)
+        print(f"Estimated mean inter-Hamming distance from {samples} pairs: {mean * 100:.2f}% (95% CI {low * 100:.2f}% - {high * 100:.2f}%)")
+        plt.hist(distances, bins=range(bit_length + 1), density=True, alpha=0.75, label='Measured Distribution')
     
     plt.title(f'Inter-Hamming Distance Distribution for {column_name}')
     plt.xlabel('Hamming Distance')
@@ -200,7 +271,7 @@ def temperature_plot(df, column_name):
     '''
     plt.figure(figsize=(12, 6))
     # Using the DataFrame index directly for the x-axis ensures order
-    sns.lineplot(data=df, y=column_name, x=df.index, alpha=0.8)
+    sns.lineplot(y=df[column_name], x=df.index, alpha=0.8)
     plt.title(f'Temperature Evolution for {column_name}')
     plt.xlabel('Sample Index')
     plt.ylabel('Temperature (°C)')
@@ -213,7 +284,7 @@ def voltage_plot(df, column_name):
     Creates and saves a plot showing the evolution of vccint.
     '''
     plt.figure(figsize=(12, 6))
-    sns.lineplot(data=df, y=column_name, x=df.index, color='orange', alpha=0.8)
+    sns.lineplot(y=df[column_name], x=df.index, color='orange', alpha=0.8)
     plt.title(f'VCCINT Voltage Evolution for {column_name}')
     plt.xlabel('Sample Index')
     plt.ylabel('Voltage (V)')
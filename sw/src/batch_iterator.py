@@ -0,0 +1,110 @@
+# batch_iterator.py
+
+import queue
+import threading
+import numpy as np
+
+class BatchIterator:
+    '''
+    Minibatch iterator over (x, y) arrays (np.memmap included), e.g. MNIST splits or the
+    PUF-response (X, y) returned by data_preprocessing_2.preprocess_csv.
+
+    Each epoch shuffles an index array instead of the data and gathers batches into reusable
+    buffers, while a background thread prefetches the next batch. transform_x / transform_y
+    (called as f(raw_batch, out)) run inside the gather, e.g. MNIST.normalize / MNIST.one_hot.
+
+    Yielded batches are views into the reused buffers: they are only valid until the next
+    batch is requested, so copy them if they have to be kept.
+    '''
+    def __init__(self, x, y, batch_size=32, shuffle=True, transform_x=None, transform_y=None,
+                 prefetch=True, n_buffers=2, rng=None):
+        if x.shape[0] != y.shape[0]:
+            raise ValueError(f'x and y lengths differ: {x.shape[0]} != {y.shape[0]}')
+
+        self.x = x
+        self.y = y
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.transforms = (transform_x, transform_y)
+        self.prefetch = prefetch
+        self.rng = rng or np.random.default_rng()
+        self.order = np.arange(x.shape[0])
+
+        # One buffer set is being consumed while the others are filled
+        self.n_buffers = max(2, n_buffers) if prefetch else 1
+        self.raw_buffers = [[self.empty_like_rows(x), self.empty_like_rows(y)] for _ in range(self.n_buffers)]
+        self.out_buffers = [[None, None] for _ in range(self.n_buffers)]
+
+    def empty_like_rows(self, array):
+        return np.empty((self.batch_size,) + array.shape[1:], dtype=array.dtype)
+
+    def __len__(self):
+        return (self.x.shape[0] + self.batch_size - 1) // self.batch_size
+
+    def gather(self, slot, start):
+        indices = self.order[start:start + self.batch_size]
+        rows = indices.shape[0]
+        batch = []
+        for k, source in enumerate((self.x, self.y)):
+            raw = self.raw_buffers[slot][k][:rows]
+            # Indices always come from self.order, so skip the bounds-checked (buffered) take
+            np.take(source, indices, axis=0, out=raw, mode='clip')
+
+            transform = self.transforms[k]
+            if transform is None:
+                batch.append(raw)
+                continue
+            if self.out_buffers[slot][k] is None:
+                # Output shape/dtype is only known after the first transform
+                first = transform(raw, None)
+                self.out_buffers[slot][k] = np.empty((self.batch_size,) + first.shape[1:], dtype=first.dtype)
+                self.out_buffers[slot][k][:rows] = first
+            else:
+                transform(raw, self.out_buffers[slot][k][:rows])
+            batch.append(self.out_buffers[slot][k][:rows])
+        return tuple(batch)
+
+    def __iter__(self):
+        if self.shuffle:
+            self.rng.shuffle(self.order)
+        starts = range(0, self.x.shape[0], self.batch_size)
+
+        if not self.prefetch:
+            for start in starts:
+                yield self.gather(0, start)
+            return
+
+        free = queue.Queue()
+        ready = queue.Queue()
+        stop = threading.Event()
+        for slot in range(self.n_buffers):
+            free.put(slot)
+
+        def producer():
+            try:
+                for start in starts:
+                    slot = free.get()
+                    if stop.is_set():
+                        return
+                    ready.put((slot, self.gather(slot, start)))
+                ready.put(None)
+            except BaseException as e:
+                ready.put(e)
+
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                slot, batch = item
+                yield batch
+                free.put(slot)
+        finally:
+            # Unblock the producer if the consumer stopped early
+            stop.set()
+            free.put(None)
+            thread.join()
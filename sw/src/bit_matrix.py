@@ -0,0 +1,117 @@
+# bit_matrix.py
+
+import numpy as np
+
+CHUNK_ROWS = 1 << 16 # Rows decoded / unpacked at a time, to bound temporaries
+
+# Popcount per byte, used when np.bitwise_count (NumPy >= 2.0) is not available
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def popcount(words):
+    '''
+    Number of set bits of each element of an unsigned integer array.
+    '''
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    counts = _POPCOUNT_TABLE[words.view(np.uint8)].reshape(words.shape + (words.itemsize,))
+    return counts.sum(axis=-1, dtype=np.uint8)
+
+def strings_to_bits(strings, n_bits):
+    '''
+    Decodes an array of '0'/'1' strings into a (N, n_bits) uint8 matrix with vectorized byte ops.
+    '''
+    strings = np.asarray(strings)
+    if strings.dtype.kind not in 'SU':
+        strings = strings.astype(str)
+    # Checked before the cast to S{n_bits}, which would silently truncate longer strings
+    lengths = np.char.str_len(strings)
+    if lengths.size and (lengths.min() != n_bits or lengths.max() != n_bits):
+        raise ValueError(f'All responses must be {n_bits} bits long')
+    raw = strings.astype(f'S{n_bits}')
+    bits = raw.view(np.uint8).reshape(-1, n_bits) - ord('0')
+    if bits.size and bits.max() > 1:
+        raise ValueError("Responses may only contain '0' and '1'")
+    return bits
+
+class BitMatrix:
+    '''
+    Responses stored packed, one row per response: bits MSB-first (bit 0 is the first character
+    of the response string), padded with zeros to whole uint64 words. Distances are XOR + popcount
+    on the words, so a 128-bit response takes 16 bytes instead of a 128-character string.
+    '''
+    def __init__(self, packed, n_bits):
+        self.n_bits = n_bits
+        # (N, n_bytes) uint8, n_bytes a multiple of 8 so that the uint64 view below is free
+        self.packed = packed
+        self.words = packed.view(np.uint64)
+
+    @classmethod
+    def from_bits(cls, bits):
+        bits = np.atleast_2d(bits)
+        n_bits = bits.shape[1]
+        n_bytes = (n_bits + 63) // 64 * 8
+        packed = np.zeros((bits.shape[0], n_bytes), dtype=np.uint8)
+        packed[:, :(n_bits + 7) // 8] = np.packbits(bits.astype(np.uint8, copy=False), axis=1)
+        return cls(packed, n_bits)
+
+    @classmethod
+    def from_strings(cls, strings, n_bits=None):
+        strings = np.asarray(strings)
+        if n_bits is None:
+            n_bits = len(strings[0]) if strings.size else 0
+        n_bytes = (n_bits + 63) // 64 * 8
+        packed = np.zeros((strings.shape[0], n_bytes), dtype=np.uint8)
+        for start in range(0, strings.shape[0], CHUNK_ROWS):
+            bits = strings_to_bits(strings[start:start + CHUNK_ROWS], n_bits)
+            packed[start:start + CHUNK_ROWS, :(n_bits + 7) // 8] = np.packbits(bits, axis=1)
+        return cls(packed, n_bits)
+
+    @classmethod
+    def from_column(cls, df, column_name):
+        return cls.from_strings(df[column_name].astype(str).to_numpy())
+
+    def __len__(self):
+        return self.packed.shape[0]
+
+    def __getitem__(self, rows):
+        return BitMatrix(np.atleast_2d(self.packed[rows]), self.n_bits)
+
+    def to_bits(self, rows=slice(None)):
+        return np.unpackbits(np.atleast_2d(self.packed[rows]), axis=1, count=self.n_bits)
+
+    def to_strings(self):
+        return [bytes(row + ord('0')).decode('ascii') for row in self.to_bits()]
+
+    def ones_per_row(self):
+        return popcount(self.words).sum(axis=1, dtype=np.int64)
+
+    def hamming_to(self, reference):
+        '''
+        Hamming distance of every row to a single reference response (BitMatrix row or bit string).
+        '''
+        if isinstance(reference, str):
+            reference = BitMatrix.from_strings([reference], self.n_bits)
+        return popcount(self.words ^ reference.words[0]).sum(axis=1, dtype=np.int64)
+
+    def hamming_pairs(self, other):
+        '''
+        Row-wise Hamming distances between two matrices with the same number of rows.
+        '''
+        return popcount(self.words ^ other.words).sum(axis=1, dtype=np.int64)
+
+    def flips(self, reference):
+        '''
+        Unpacked (N, n_bits) bool matrix, True where a row differs from the reference.
+        '''
+        if isinstance(reference, str):
+            reference = BitMatrix.from_strings([reference], self.n_bits)
+        return np.unpackbits(self.packed ^ reference.packed[0], axis=1, count=self.n_bits).astype(bool)
+
+    def bit_counts(self):
+        '''
+        Number of ones at every bit position, unpacking CHUNK_ROWS rows at a time.
+        '''
+        counts = np.zeros(self.n_bits, dtype=np.int64)
+        for start in range(0, len(self), CHUNK_ROWS):
+            counts += np.unpackbits(self.packed[start:start + CHUNK_ROWS], axis=1, count=self.n_bits).sum(axis=0, dtype=np.int64)
+        return counts
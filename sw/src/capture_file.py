@@ -0,0 +1,194 @@
+# capture_file.py
+#
+# Binary capture format for PUF measurements, replacing the '0'/'1' text CSVs.
+#
+# Layout:
+#   0x00    : magic b'PUFCAP01' (8 bytes)
+#   0x08    : manifest length in bytes (uint64, little-endian)
+#   0x10    : JSON manifest (bits per section, metadata)
+#   ...     : fixed-size little-endian records, starting at the first ALIGNMENT byte boundary after the manifest.
+#
+# Every record holds the same fields as a CSV row, plus a timestamp and a board ID:
+#   Timestamp (float64, UNIX seconds), Board_ID (uint16),
+#   {section}_Value (packed bits, MSB first as in bit_matrix.py), {section}_Vccint / {section}_Temperature (float32)
+# for section in LFSR_Seed (9 bits, 2 bytes) and PUF_Response (128 bits, 16 bytes): 44 bytes per measurement.
+#
+# The record count follows from the file size, so appending is a plain write at the end of the file
+# and the whole capture is opened as one np.memmap. A partially written last record is ignored.
+
+import io
+import json
+import os
+import struct
+import time
+import numpy as np
+import pandas as pd
+from src.bit_matrix import BitMatrix, strings_to_bits
+
+MAGIC = b'PUFCAP01'
+ALIGNMENT = 64
+PREFIX = struct.Struct('<8sQ')
+SECTIONS = {'LFSR_Seed': 9, 'PUF_Response': 128}
+CSV_COLUMNS = [f'{section}_{field}' for section in SECTIONS for field in ['Value', 'Vccint', 'Temperature']]
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def record_dtype(sections=SECTIONS):
+    fields = [('Timestamp', '<f8'), ('Board_ID', '<u2')]
+    for section, n_bits in sections.items():
+        fields += [(f'{section}_Value', 'u1', ((n_bits + 7) // 8,)),
+                   (f'{section}_Vccint', '<f4'),
+                   (f'{section}_Temperature', '<f4')]
+    return np.dtype(fields)
+
+def is_capture_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def read_manifest(path):
+    '''
+    Returns the manifest and the absolute offset where the records start.
+    '''
+    with open(path, 'rb') as f:
+        magic, manifest_length = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f'Magic number mismatch for capture file, expected {MAGIC}, got {magic}')
+        return json.loads(f.read(manifest_length)), align(PREFIX.size + manifest_length)
+
+def create_capture(path, sections=SECTIONS, metadata=None):
+    '''
+    Writes the header of an empty capture file.
+    '''
+    manifest_bytes = json.dumps({'sections': sections, 'metadata': metadata or {}}).encode()
+    with open(path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, len(manifest_bytes)))
+        f.write(manifest_bytes)
+        f.write(b'\0' * (align(PREFIX.size + len(manifest_bytes)) - f.tell()))
+
+def pack_column(values, n_bits):
+    '''
+    Packs a response column given as bit strings, a (N, n_bits) 0/1 matrix or already packed bytes.
+    '''
+    values = np.asarray(values)
+    if values.dtype.kind in 'USO':
+        values = strings_to_bits(values, n_bits)
+    if values.ndim == 2 and values.shape[1] == n_bits:
+        return np.packbits(values.astype(np.uint8, copy=False), axis=1)
+    return values
+
+class CaptureWriter:
+    '''
+    Appends measurements to a capture file, creating it if needed.
+    '''
+    def __init__(self, path, board_id=0, sections=SECTIONS, metadata=None):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            create_capture(path, sections, metadata)
+        manifest, data_start = read_manifest(path)
+        self.path = path
+        self.board_id = board_id
+        self.sections = manifest['sections']
+        self.dtype = record_dtype(self.sections)
+
+        self.file = open(path, 'r+b')
+        # Drop a partially written record left by an interrupted writer
+        size = os.path.getsize(path)
+        self.file.truncate(data_start + (size - data_start) // self.dtype.itemsize * self.dtype.itemsize)
+        self.file.seek(0, io.SEEK_END)
+
+    def append(self, columns):
+        '''
+        Appends one record per row of `columns`, a dict (or DataFrame) keyed by field name.
+        Responses may be bit strings, bit matrices or packed bytes; missing environment values
+        are NaN, and Timestamp / Board_ID default to now and the writer's board.
+        '''
+        n_rows = len(next(iter(columns.values())) if isinstance(columns, dict) else columns)
+        records = np.zeros(n_rows, dtype=self.dtype)
+        records['Timestamp'] = time.time()
+        records['Board_ID'] = self.board_id
+        for section, n_bits in self.sections.items():
+            records[f'{section}_Vccint'] = np.nan
+            records[f'{section}_Temperature'] = np.nan
+
+        for name in self.dtype.names:
+            if name not in columns:
+                continue
+            if name.endswith('_Value'):
+                records[name] = pack_column(columns[name], self.sections[name[:-len('_Value')]])
+            else:
+                records[name] = np.asarray(columns[name], dtype=float)
+        self.append_records(records)
+
+    def append_records(self, records):
+        self.file.write(memoryview(np.ascontiguousarray(records, dtype=self.dtype)).cast('B'))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Capture:
+    '''
+    Read-only snapshot of a capture file (records written later need a new open_capture()).
+    Indexing by a CSV column name returns a Series like the CSV DataFrame would, while
+    bit_matrix() hands the packed responses to the analysis code without any text in between.
+    '''
+    def __init__(self, records, sections, metadata=None):
+        self.records = records
+        self.sections = sections
+        self.metadata = metadata or {}
+        self.index = pd.RangeIndex(len(records))
+
+    @property
+    def columns(self):
+        return pd.Index(self.records.dtype.names)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, name):
+        return name in self.records.dtype.names
+
+    def __getitem__(self, name):
+        if name.endswith('_Value'):
+            return pd.Series(self.bit_matrix(name).to_strings(), index=self.index, name=name)
+        return pd.Series(self.records[name], index=self.index, name=name)
+
+    def bit_matrix(self, column_name):
+        n_bits = self.sections[column_name[:-len('_Value')]]
+        packed = np.zeros((len(self), (n_bits + 63) // 64 * 8), dtype=np.uint8)
+        packed[:, :(n_bits + 7) // 8] = self.records[column_name]
+        return BitMatrix(packed, n_bits)
+
+    def to_dataframe(self, columns=None):
+        '''
+        DataFrame in the CSV layout (responses as bit strings), e.g. for code that still expects text.
+        '''
+        columns = columns or list(self.records.dtype.names)
+        return pd.DataFrame({name: self[name] for name in columns})
+
+def open_capture(path, mode='r'):
+    manifest, data_start = read_manifest(path)
+    dtype = record_dtype(manifest['sections'])
+    n_records = (os.path.getsize(path) - data_start) // dtype.itemsize
+    if n_records == 0:
+        records = np.zeros(0, dtype=dtype)
+    else:
+        records = np.memmap(path, dtype=dtype, mode=mode, offset=data_start, shape=(n_records,))
+    return Capture(records, manifest['sections'], manifest['metadata'])
+
+def csv_to_capture(csv_path, capture_path, board_id=0, chunksize=1 << 16):
+    '''
+    One-time conversion of a capture CSV (LFSR_Seed_* / PUF_Response_* columns) to the binary format.
+    The CSVs carry no timestamps, so Timestamp is NaN for converted rows.
+    '''
+    with CaptureWriter(capture_path, board_id, metadata={'source': os.path.basename(csv_path)}) as writer:
+        for chunk in pd.read_csv(csv_path, dtype=str, chunksize=chunksize):
+            columns = {name: chunk[name].to_numpy() for name in CSV_COLUMNS}
+            columns['Timestamp'] = np.full(len(chunk), np.nan)
+            writer.append(columns)
@@ -1,42 +1,70 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from src import analysis as an
+from src.bit_matrix import CHUNK_ROWS, strings_to_bits
+from src.capture_file import is_capture_file, open_capture
 
 def hamming_distance(s1, s2):
     """Calculates the number of differing bits between two strings."""
     return sum(c1 != c2 for c1, c2 in zip(s1, s2))
 
-def string_to_bits(bit_string):
-    # Converting each character to an integer
-    bits = [int(char) for char in bit_string]
-    return pd.Series(bits)
+def augmentation_arrays(ideal_bits, num_high_flip, num_random, num_explicit_garbage,
+                        vccint_range, temp_range, rng, flip_fraction=0.3):
+    """
+    Generates the whole augmentation set at once: highly-flipped copies of the ideal value,
+    random responses, then num_explicit_garbage all-zero and all-one responses, each with
+    uniform random Vccint/Temperature. Targets equal the inputs (identity task).
+    Returns (bits, vccint, temperature) with bits as a (N, num_bits) uint8 matrix.
+    """
+    num_bits = ideal_bits.size
+    total = num_high_flip + num_random + 2 * num_explicit_garbage
+    bits = np.empty((total, num_bits), dtype=np.uint8)
+
+    # High-flip rows: the k smallest of num_bits uniform keys are a uniform k-subset of positions,
+    # i.e. one np.random.choice(num_bits, k, replace=False) per row
+    num_flips = int(num_bits * flip_fraction)
+    for start in range(0, num_high_flip, CHUNK_ROWS):
+        rows = min(CHUNK_ROWS, num_high_flip - start)
+        block = bits[start:start + rows]
+        block[:] = ideal_bits
+        if num_flips > 0:
+            keys = rng.random((rows, num_bits), dtype=np.float32)
+            bits_to_flip = np.argpartition(keys, num_flips - 1, axis=1)[:, :num_flips]
+            block[np.arange(rows)[:, None], bits_to_flip] ^= 1
+
+    end = num_high_flip + num_random
+    bits[num_high_flip:end] = rng.integers(0, 2, (num_random, num_bits), dtype=np.uint8)
+    bits[end:end + num_explicit_garbage] = 0
+    bits[end + num_explicit_garbage:] = 1
+
+    vccint = rng.uniform(vccint_range[0], vccint_range[1], total)
+    temperature = rng.uniform(temp_range[0], temp_range[1], total)
+    return bits, vccint, temperature
 
 # Section is 'LFSR_Seed' or 'PUF_Response'
-def preprocess_df(df, section, num_bits, debug, save_path=None, validity_threshold=20, augmentation_factor=2):
+def preprocess_df(df, section, num_bits, debug, *, save_prefix=None, validity_threshold=20, augmentation_factor=2, seed=None):
+    """
+    Builds (X, y) for one section. With save_prefix, X and y are written to <save_prefix>_X.npy and
+    <save_prefix>_y.npy (this replaces the former save_path, which named a single CSV file).
+    """
+    rng = np.random.default_rng(seed)
 
     ## nitial Preparation of Original Data
-    # Convert V/T columns to numeric type once at the beginning.
-    df[f'{section}_Vccint'] = pd.to_numeric(df[f'{section}_Vccint'])
-    df[f'{section}_Temperature'] = pd.to_numeric(df[f'{section}_Temperature'])
-
-    # Get the min/max from the ORIGINAL data to use for augmentation range.
-    vccint_min_orig = df[f'{section}_Vccint'].min()
-    vccint_max_orig = df[f'{section}_Vccint'].max()
-    temp_min_orig = df[f'{section}_Temperature'].min()
-    temp_max_orig = df[f'{section}_Temperature'].max()
+    vccint = pd.to_numeric(df[f'{section}_Vccint']).to_numpy(dtype=float)
+    temperature = pd.to_numeric(df[f'{section}_Temperature']).to_numpy(dtype=float)
 
     # --- Find Ideal Value and Create Smart Labels for Original Data ---
     ideal_value = an.get_ideal_value(df, f'{section}_Value')
     if debug:
         print(f"Ideal Value found: {ideal_value}\n")
 
-    distances = an.calculate_intra_hamming_distances(df, f'{section}_Value', ideal_value)
-    df[f'{section}_Target_Value'] = np.where(
-        distances <= validity_threshold,
-        ideal_value,
-        df[f'{section}_Value']
-    )
+    # Responses within validity_threshold of the ideal value are labelled with it
+    bits = an.get_bit_matrix(df, f'{section}_Value').to_bits()
+    ideal_bits = strings_to_bits([ideal_value], num_bits)[0]
+    distances = an.calculate_intra_hamming_distances(df, f'{section}_Value', ideal_value).to_numpy()
+    target_bits = np.where((distances <= validity_threshold)[:, None], ideal_bits, bits)
 
     # --- Augment the dataset with random garbage data ---
     # This explicitly teaches the model the identity task for random inputs.
@@ -44,91 +72,43 @@ def preprocess_df(df, section, num_bits, debug, save_path=None, validity_thresho
     if debug:
         print(f"Augmenting dataset with {num_to_augment} samples...\n")
 
-    augmented_rows = []
-    
     num_high_flip = num_to_augment // 2  # Use half the budget for highly-flipped samples
     num_random = num_to_augment - num_high_flip # Use the other half for random samples
-    
-    # High-Flip Augmentation
-    ideal_array = np.array(list(map(int, ideal_value)))
-    for _ in range(num_high_flip):
-        bits_to_flip = np.random.choice(num_bits, size=int(num_bits * 0.3), replace=False)
-        
-        flipped_array = ideal_array.copy()
-        flipped_array[bits_to_flip] = 1 - flipped_array[bits_to_flip] # Flip the bits
-        flipped_string = "".join(map(str, flipped_array))
-        
-        new_row = {
-            f'{section}_Value': flipped_string,
-            f'{section}_Vccint': np.random.uniform(vccint_min_orig, vccint_max_orig),
-            f'{section}_Temperature': np.random.uniform(temp_min_orig, temp_max_orig),
-            f'{section}_Target_Value': flipped_string
-        }
-        augmented_rows.append(new_row)
-
-    # Random Garbage Augmentation
-    for _ in range(num_random):
-        random_bits = np.random.randint(0, 2, num_bits)
-        random_string = "".join(map(str, random_bits))
-        
-        new_row = {
-            f'{section}_Value': random_string,
-            f'{section}_Vccint': np.random.uniform(vccint_min_orig, vccint_max_orig),
-            f'{section}_Temperature': np.random.uniform(temp_min_orig, temp_max_orig),
-            f'{section}_Target_Value': random_string
-        }
-        augmented_rows.append(new_row)
-        
-    # Explicitly add all-zero and all-one examples
-    num_explicit_garbage = 200 # Add 200 of each
-
-    # All Zeros
-    for _ in range(num_explicit_garbage):
-        new_row = {
-            f'{section}_Value': '0' * num_bits,
-            f'{section}_Vccint': np.random.uniform(vccint_min_orig, vccint_max_orig),
-            f'{section}_Temperature': np.random.uniform(temp_min_orig, temp_max_orig),
-            f'{section}_Target_Value': '0' * num_bits
-        }
-        augmented_rows.append(new_row)
-        
-    # All Ones
-    for _ in range(num_explicit_garbage):
-        new_row = {
-            f'{section}_Value': '1' * num_bits,
-            f'{section}_Vccint': np.random.uniform(vccint_min_orig, vccint_max_orig),
-            f'{section}_Temperature': np.random.uniform(temp_min_orig, temp_max_orig),
-            f'{section}_Target_Value': '1' * num_bits
-        }
-        augmented_rows.append(new_row)
-
-    # Add the new augmented data to the main DataFrame
-    if augmented_rows:
-        augmented_df = pd.DataFrame(augmented_rows)
-        df = pd.concat([df, augmented_df], ignore_index=True)
-    
-    # Final Normalization on the Complete Dataset
-    # Now that the DataFrame is complete (original + augmented), we normalize everything.
-    df[f'{section}_Vccint'] = (df[f'{section}_Vccint'] - df[f'{section}_Vccint'].min()) / (df[f'{section}_Vccint'].max() - df[f'{section}_Vccint'].min())
-    df[f'{section}_Temperature'] = (df[f'{section}_Temperature'] - df[f'{section}_Temperature'].min()) / (df[f'{section}_Temperature'].max() - df[f'{section}_Temperature'].min())
-
-    # Expand Bitstrings and Split into X and y
-    bits_df = df[f'{section}_Value'].apply(string_to_bits).add_prefix(f'{section}_Bit_')
-    target_bits_df = df[f'{section}_Target_Value'].apply(string_to_bits).add_prefix(f'{section}_Target_Bit_')
+    num_explicit_garbage = 200 # Explicitly add 200 all-zero and 200 all-one examples
 
-    original_data_df = df[[f'{section}_Vccint', f'{section}_Temperature']]
-    final_df = pd.concat([original_data_df, bits_df, target_bits_df], axis=1)
-    
-    final_df_shuffled = final_df.sample(frac=1).reset_index(drop=True)
-
-    if save_path:
-        final_df_shuffled.to_csv(save_path, index=False)
-        print(f"Processed data saved to {save_path}")
-
-    feature_columns = [f'{section}_Vccint', f'{section}_Temperature'] + [f'{section}_Bit_{i}' for i in range(num_bits)]
-    label_columns = [f'{section}_Target_Bit_{i}' for i in range(num_bits)]
-    X = final_df_shuffled[feature_columns].values
-    y = final_df_shuffled[label_columns].values
+    augmented_bits, augmented_vccint, augmented_temperature = augmentation_arrays(
+        ideal_bits, num_high_flip, num_random, num_explicit_garbage,
+        (vccint.min(), vccint.max()), (temperature.min(), temperature.max()), rng
+    )
+    # Preallocated outputs, filled in shuffled order: row i of the unshuffled set goes to positions[i]
+    num_original = bits.shape[0]
+    total = num_original + augmented_bits.shape[0]
+    if save_prefix:
+        X = np.lib.format.open_memmap(f'{save_prefix}_X.npy', mode='w+', dtype=np.float32, shape=(total, 2 + num_bits))
+        y = np.lib.format.open_memmap(f'{save_prefix}_y.npy', mode='w+', dtype=np.uint8, shape=(total, num_bits))
+    else:
+        X = np.empty((total, 2 + num_bits), dtype=np.float32)
+        y = np.empty((total, num_bits), dtype=np.uint8)
+    positions = rng.permutation(total)
+    original, augmented = positions[:num_original], positions[num_original:]
+
+    # Final Normalization on the Complete Dataset (original + augmented)
+    for column, values, augmented_values in [(0, vccint, augmented_vccint), (1, temperature, augmented_temperature)]:
+        low = min(values.min(), augmented_values.min())
+        high = max(values.max(), augmented_values.max())
+        X[original, column] = (values - low) / (high - low)
+        X[augmented, column] = (augmented_values - low) / (high - low)
+
+    # Split into X (Vccint, Temperature, bits) and y (target bits)
+    X[original, 2:] = bits
+    X[augmented, 2:] = augmented_bits
+    y[original] = target_bits
+    y[augmented] = augmented_bits
+
+    if save_prefix:
+        X.flush()
+        y.flush()
+        print(f"Processed data saved to {save_prefix}_X.npy / {save_prefix}_y.npy")
     
     if debug:
         print(f"Final shape of features (X): {X.shape}")
@@ -136,33 +116,56 @@ def preprocess_df(df, section, num_bits, debug, save_path=None, validity_thresho
     
     return (X, y)
 
-def preprocess_csv(csv_path, debug, save_dir=None, validity_threshold=20):
-    
+def preprocess_csv(csv_path, debug, save_dir=None, validity_threshold=20, seed=None):
+    """
+    Preprocesses the lfsr_seed and puf_response sections of a capture (CSV or binary capture file)
+    in parallel threads. With save_dir, X and y are written as .npy files (see load_processed).
+    """
     try:
-        df = pd.read_csv(csv_path, dtype=str)
+        # Binary captures (see capture_file.py) are used as they are, CSVs are split into sections
+        if is_capture_file(csv_path):
+            lfsr_seed_df = puf_response_df = open_capture(csv_path)
+        else:
+            df = pd.read_csv(csv_path, dtype=str)
+            (lfsr_seed_df, puf_response_df) = (df.iloc[:, :3].copy(), df.iloc[:, 3:].copy())
     except FileNotFoundError:
         print(f"Error: {csv_path} not found.")
         import sys
         sys.exit()
     
-    (lfsr_seed_df, puf_response_df) = (df.iloc[:, :3].copy(), df.iloc[:, 3:].copy())
-    
-    lfsr_save_path = None
-    puf_save_path = None
+    lfsr_save_prefix = None
+    puf_save_prefix = None
     if save_dir:
         os.makedirs(save_dir, exist_ok=True)
-        lfsr_save_path = os.path.join(save_dir, 'lfsr_seed_processed_2.csv')
-        puf_save_path = os.path.join(save_dir, 'puf_response_processed_2.csv')
+        lfsr_save_prefix = os.path.join(save_dir, 'lfsr_seed_processed_2')
+        puf_save_prefix = os.path.join(save_dir, 'puf_response_processed_2')
+
+    # Independent child seeds, so the two sections never draw the same random stream
+    lfsr_seed_seq, puf_response_seq = np.random.SeedSequence(seed).spawn(2)
+
+    # Both sections are independent and spend their time in NumPy, which releases the GIL
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        lfsr_seed = pool.submit(
+            preprocess_df, lfsr_seed_df, 'LFSR_Seed', 9, debug,
+            save_prefix=lfsr_save_prefix,
+            validity_threshold=2, seed=lfsr_seed_seq
+        )
+        puf_response = pool.submit(
+            preprocess_df, puf_response_df, 'PUF_Response', 128, debug,
+            save_prefix=puf_save_prefix,
+            validity_threshold=validity_threshold, seed=puf_response_seq
+        )
+        return {
+            'lfsr_seed': lfsr_seed.result(),
+            'puf_response': puf_response.result()
+        }
 
+def load_processed(save_dir, mmap_mode='r'):
+    """
+    Memory-maps the (X, y) sets written by preprocess_csv(..., save_dir=save_dir).
+    """
     return {
-        'lfsr_seed': preprocess_df(
-            lfsr_seed_df, 'LFSR_Seed', 9, debug, 
-            save_path=lfsr_save_path, 
-            validity_threshold=2
-        ),
-        'puf_response': preprocess_df(
-            puf_response_df, 'PUF_Response', 128, debug, 
-            save_path=puf_save_path, 
-            validity_threshold=validity_threshold
-        )
+        name: (np.load(os.path.join(save_dir, f'{name}_processed_2_X.npy'), mmap_mode=mmap_mode),
+               np.load(os.path.join(save_dir, f'{name}_processed_2_y.npy'), mmap_mode=mmap_mode))
+        for name in ['lfsr_seed', 'puf_response']
     }
@@ -0,0 +1,90 @@
+# inter_hamming.py
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from src.bit_matrix import popcount
+
+BLOCK_ROWS = 512 # Rows per tile side: a tile holds BLOCK_ROWS^2 * words_per_row uint64 XORs
+
+# Packed words shared by every task in a worker process, set once by the pool initializer
+_worker_words = None
+
+def tile_histogram(words_a, words_b, n_bits, diagonal=False):
+    '''
+    Histogram of the Hamming distances between every row of words_a and every row of words_b.
+    On a diagonal tile (words_a is words_b) every unordered pair is counted once and self-pairs are dropped.
+    '''
+    distances = np.zeros((words_a.shape[0], words_b.shape[0]), dtype=np.int64)
+    for w in range(words_a.shape[1]):
+        distances += popcount(np.bitwise_xor.outer(words_a[:, w], words_b[:, w]))
+    histogram = np.bincount(distances.ravel(), minlength=n_bits + 1)
+
+    if diagonal:
+        # Each pair appears twice, plus one zero-distance self-pair per row
+        histogram[0] -= words_a.shape[0]
+        histogram //= 2
+    return histogram
+
+def _init_worker(words):
+    global _worker_words
+    _worker_words = words
+
+def _tile_task(task):
+    start_a, start_b, block_rows, n_bits = task
+    words_a = _worker_words[start_a:start_a + block_rows]
+    words_b = _worker_words[start_b:start_b + block_rows]
+    return tile_histogram(words_a, words_b, n_bits, diagonal=start_a == start_b)
+
+def inter_hamming_histogram(bits, block_rows=BLOCK_ROWS, max_workers=None):
+    '''
+    Exact histogram of the inter-Hamming distances over all N*(N-1)/2 pairs of a BitMatrix.
+    The pair matrix is processed in block_rows x block_rows tiles (upper triangle only), so memory
+    stays bounded for any N, and the tiles are spread over a process pool (max_workers=1 runs in process).
+    '''
+    words = np.ascontiguousarray(bits.words)
+    starts = range(0, words.shape[0], block_rows)
+    tasks = [(a, b, block_rows, bits.n_bits) for a in starts for b in starts if b >= a]
+
+    histogram = np.zeros(bits.n_bits + 1, dtype=np.int64)
+    if max_workers == 1 or len(tasks) <= 1:
+        _init_worker(words)
+        for task in tasks:
+            histogram += _tile_task(task)
+        return histogram
+
+    max_workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(words,)) as pool:
+        for tile in pool.map(_tile_task, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))):
+            histogram += tile
+    return histogram
+
+def sample_inter_hamming(bits, samples, rng=None):
+    '''
+    Fast estimator: Hamming distances of `samples` random pairs of different responses.
+    '''
+    if len(bits) < 2:
+        raise ValueError(f'Sampling inter-Hamming distances needs at least 2 responses, got {len(bits)}')
+    rng = rng or np.random.default_rng()
+    idx1 = rng.integers(0, len(bits), samples)
+    idx2 = rng.integers(0, len(bits) - 1, samples)
+    idx2 += idx2 >= idx1
+    return bits[idx1].hamming_pairs(bits[idx2])
+
+def mean_confidence_interval(distances, n_bits, z=1.96):
+    '''
+    Mean fractional inter-Hamming distance of sampled pairs and its normal-approximation confidence interval.
+    '''
+    fractions = np.asarray(distances) / n_bits
+    mean = fractions.mean()
+    half_width = z * fractions.std(ddof=1) / np.sqrt(fractions.size) if fractions.size > 1 else np.inf
+    return mean, (mean - half_width, mean + half_width)
+
+def histogram_mean(histogram, n_bits):
+    '''
+    Exact mean fractional inter-Hamming distance from an all-pairs histogram.
+    '''
+    n_pairs = histogram.sum()
+    if n_pairs == 0:
+        raise ValueError('The histogram has no pairs: at least 2 responses are needed')
+    return np.dot(np.arange(histogram.size), histogram) / (n_pairs * n_bits)
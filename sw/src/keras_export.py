@@ -0,0 +1,96 @@
+# keras_export.py
+#
+# Exports a keras.Sequential of Dense layers (e.g. the PUF response correction agent) to a model
+# container (see model_container.py), and runs it with NumPy and scipy.special only. Keras is needed
+# for the export, never for loading or inference.
+
+import numpy as np
+from scipy.special import expit
+from src.mlp import MLP
+from src import model_container as container
+
+ACTIVATIONS = ('linear', 'relu', 'sigmoid', 'softmax')
+# Layers that are the identity at inference time
+SKIPPED_LAYERS = ('InputLayer', 'Dropout')
+
+def dense_layers(model):
+    '''
+    (weights, biases, activation name) for every Dense layer of a Sequential model, in order.
+    '''
+    layers = []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        if kind in SKIPPED_LAYERS:
+            continue
+        if kind != 'Dense':
+            raise ValueError(f'Only Dense layers can be exported, got {kind} ({layer.name})')
+
+        config = layer.get_config()
+        activation = config['activation']
+        if not isinstance(activation, str) or activation not in ACTIVATIONS:
+            raise ValueError(f'Unsupported activation {activation!r} in {layer.name}, expected one of {ACTIVATIONS}')
+        if not config.get('use_bias', True):
+            weights, = layer.get_weights()
+            biases = np.zeros(weights.shape[1], dtype=weights.dtype)
+        else:
+            weights, biases = layer.get_weights()
+        layers.append((weights, biases, activation))
+    return layers
+
+def export_keras(model, path, dtype=np.float32):
+    '''
+    Writes the Dense layers of a Keras model to a single container file loadable with DenseMLP.load.
+    '''
+    layers = dense_layers(model)
+    weights = {f"W{i+1}": np.asarray(w, dtype=dtype) for i, (w, _, _) in enumerate(layers)}
+    biases = {f"b{i+1}": np.asarray(b, dtype=dtype).reshape(1, -1) for i, (_, b, _) in enumerate(layers)}
+    mlp = DenseMLP(activations=[activation for _, _, activation in layers], num_classes=layers[-1][0].shape[1], dtype=dtype)
+    mlp.weights = weights
+    mlp.biases = biases
+    mlp.save(path)
+    return mlp
+
+class DenseMLP(MLP):
+    '''
+    MLP with one activation per layer instead of ReLU hidden layers and a softmax output.
+    predict() follows Keras and returns the output activations (e.g. per-bit sigmoid probabilities);
+    infer(argmax=True) still gives class indices.
+    '''
+    def __init__(self, activations=None, **kwargs):
+        super().__init__(**kwargs)
+        self.activations = list(activations or [])
+
+    def activate(self, z, i, out=None):
+        activation = self.activations[i-1] if self.activations else None
+        if activation is None:
+            return super().activate(z, i, out)
+        if out is None:
+            out = np.empty_like(z)
+        if activation == 'relu':
+            np.maximum(z, 0, out=out)
+        elif activation == 'sigmoid':
+            # Logistic function that neither overflows nor loses precision for large |z|, in place
+            expit(z, out=out)
+        elif activation == 'softmax':
+            out[...] = self.softmax(z)
+        elif out is not z:
+            out[...] = z
+        return out
+
+    def infer(self, x, block_size=1024, argmax=False, activate_output=True):
+        '''
+        MLP.infer with each layer's activation, returning the output activations by default like Keras.
+        '''
+        return super().infer(x, block_size, argmax, activate_output)
+
+    def predict(self, x):
+        return self.infer(x)
+
+    def save(self, path, nonces=None, original_dtypes=None, metadata=None):
+        super().save(path, nonces, original_dtypes, metadata={'activations': self.activations, **(metadata or {})})
+
+    @classmethod
+    def from_container(cls, model):
+        mlp = super().from_container(model)
+        mlp.activations = model['metadata'].get('activations', [])
+        return mlp
@@ -0,0 +1,95 @@
+# locking_evaluation.py
+
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src import config
+from src.mlp import MLP
+from src.mlplocker import MLPLocker
+
+# State shared by every task in a worker process, set once by the pool initializer
+_worker_state = {}
+
+def random_keys(method, n_keys, rng=None):
+    '''
+    Draws n_keys random keys for a locking method, as the locking notebook does.
+    '''
+    rng = rng or np.random.default_rng()
+    if method == 'aes_128':
+        return [rng.bytes(16) for _ in range(n_keys)]
+    return list(rng.integers(0, config.MAX_SHUFFLE, size=(n_keys, config.LOCKING_METHODS[method])))
+
+def running_accuracy(mlp, x, labels, block_size=1000, tolerance=None, min_samples=1000):
+    '''
+    Scores the model block by block. With a tolerance, stops once the 95% confidence half-width of the
+    running accuracy falls below it (after at least min_samples), so settled accuracies skip the rest of the set.
+    Returns (accuracy, samples_evaluated).
+    '''
+    correct = 0
+    seen = 0
+    for start in range(0, x.shape[0], block_size):
+        predictions = mlp.infer(x[start:start + block_size], block_size=block_size, argmax=True)
+        correct += np.count_nonzero(predictions == labels[start:start + block_size])
+        seen += predictions.shape[0]
+
+        if tolerance is not None and seen >= min_samples:
+            p = correct / seen
+            if 1.96 * np.sqrt(p * (1 - p) / seen) < tolerance:
+                break
+
+    return correct / seen, seen
+
+def _init_worker(weights, biases, scales, num_classes, dtype, x_test, labels, options):
+    _worker_state.update(weights=weights, biases=biases, scales=scales, num_classes=num_classes, dtype=dtype,
+                         x_test=x_test, labels=labels, options=options)
+
+def _evaluate_key(task):
+    method, key_index, key = task
+    state = _worker_state
+
+    # Locking builds new arrays for every method (AES included), so variants share the base arrays
+    # without modifying them. Quantized models keep their compute dtype and per-layer scales,
+    # otherwise int8 weights are used unscaled.
+    variant = MLP(num_classes=state['num_classes'], dtype=state['dtype'])
+    variant.weights = dict(state['weights'])
+    variant.biases = dict(state['biases'])
+    variant.scales = dict(state['scales'])
+    locker = MLPLocker(variant)
+
+    locker.lock(key, method)
+    locked_accuracy, locked_samples = running_accuracy(variant, state['x_test'], state['labels'], **state['options'])
+    locker.unlock(key)
+    unlocked_accuracy, unlocked_samples = running_accuracy(variant, state['x_test'], state['labels'], **state['options'])
+
+    return {
+        'method': method,
+        'key_index': key_index,
+        'key': key.hex() if isinstance(key, bytes) else list(map(int, key)),
+        'locked_accuracy': locked_accuracy,
+        'unlocked_accuracy': unlocked_accuracy,
+        'locked_samples': locked_samples,
+        'unlocked_samples': unlocked_samples
+    }
+
+def evaluate_locking(mlp, keys, x_test, y_test, block_size=1000, tolerance=None, min_samples=1000, max_workers=None):
+    '''
+    Locks, scores, unlocks and re-scores a copy of the model for every (method, key) in keys,
+    a dict {method: list of keys}, spreading the keys over a process pool.
+    y_test may be one-hot or integer labels. max_workers=1 runs everything in this process.
+    Returns a DataFrame with one row per key.
+    '''
+    labels = np.argmax(y_test, axis=1) if y_test.ndim > 1 else np.asarray(y_test)
+    options = {'block_size': block_size, 'tolerance': tolerance, 'min_samples': min_samples}
+    tasks = [(method, key_index, key) for method, method_keys in keys.items() for key_index, key in enumerate(method_keys)]
+    init_args = (mlp.weights, mlp.biases, mlp.scales, mlp.num_classes, mlp.dtype, x_test, labels, options)
+
+    if max_workers == 1:
+        _init_worker(*init_args)
+        rows = [_evaluate_key(task) for task in tasks]
+    else:
+        max_workers = max_workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=init_args) as pool:
+            rows = list(pool.map(_evaluate_key, tasks, chunksize=max(1, len(tasks) // (4 * max_workers))))
+
+    return pd.DataFrame(rows)
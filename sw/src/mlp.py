@@ -1,27 +1,48 @@
 # mlp.py
 
 import numpy as np
+from src import permutations as perm
+from src import model_container as container
 
 class MLP:
     def __init__(self, num_classes = 10, learning_rate = 0.01,
                  W1=None, W2=None, W3=None, W4=None, 
-                 b1=None, b2=None, b3=None, b4=None):
+                 b1=None, b2=None, b3=None, b4=None, dtype=np.float32):
         
         self.num_classes = num_classes
         self.learning_rate = learning_rate
         self.locking_method = None
+        self.dtype = np.dtype(dtype)
 
+        # Per-layer dequantization scales of int8 quantized weights ({} when not quantized)
+        self.scales = {}
+
+        # Per-layer output buffers reused by infer(), rebuilt when the block size, dtype or layer widths change
+        self.inference_buffers = []
+        self.inference_buffers_key = None
+        # Float buffer the int8 weights of one layer are dequantized into, reused by every layer and block
+        self.dequantize_buffer = None
+
+        # Plaintext float weights are cast to the compute dtype. AES locked models must be loaded
+        # through MLP.load / MLPLocker.load instead, which keep the stored bytes untouched.
         self.weights = {}
-        if W1 is not None: self.weights['W1'] = W1
-        if W2 is not None: self.weights['W2'] = W2
-        if W3 is not None: self.weights['W3'] = W3
-        if W4 is not None: self.weights['W4'] = W4
+        if W1 is not None: self.weights['W1'] = self.cast(W1)
+        if W2 is not None: self.weights['W2'] = self.cast(W2)
+        if W3 is not None: self.weights['W3'] = self.cast(W3)
+        if W4 is not None: self.weights['W4'] = self.cast(W4)
 
         self.biases = {}
-        if b1 is not None: self.biases['b1'] = b1
-        if b2 is not None: self.biases['b2'] = b2
-        if b3 is not None: self.biases['b3'] = b3
-        if b4 is not None: self.biases['b4'] = b4
+        if b1 is not None: self.biases['b1'] = self.cast(b1)
+        if b2 is not None: self.biases['b2'] = self.cast(b2)
+        if b3 is not None: self.biases['b3'] = self.cast(b3)
+        if b4 is not None: self.biases['b4'] = self.cast(b4)
+
+    def cast(self, array):
+        '''
+        Casts float arrays to the compute dtype, leaving integer (e.g. quantized) arrays as they are.
+        '''
+        array = np.asarray(array)
+        return array.astype(self.dtype, copy=False) if array.dtype.kind == 'f' else array
 
     def relu(self, x):
         return np.maximum(0, x)
@@ -30,20 +51,99 @@ class MLP:
         exp_x = np.exp(x - np.max(x, axis=1, keepdims=True))
         return exp_x / np.sum(exp_x, axis=1, keepdims=True)
 
+    def activate(self, z, i, out=None):
+        '''
+        Activation of layer i (ReLU on hidden layers, softmax on the output), written into out if given.
+        Subclasses override it for other activations; every pass below goes through it.
+        '''
+        if out is None:
+            out = np.empty_like(z)
+        if i != len(self.weights):
+            np.maximum(z, 0, out=out)
+        else:
+            out[...] = self.softmax(z)
+        return out
+
     def initialize_weights(self, input_size, hidden_sizes):
         sizes = [input_size] + hidden_sizes + [self.num_classes]
         for i in range(len(sizes) - 1):
-            self.weights[f"W{i+1}"] = np.random.randn(sizes[i], sizes[i+1]) * 0.01
-            self.biases[f"b{i+1}"] = np.zeros((1, sizes[i+1]))
+            self.weights[f"W{i+1}"] = (np.random.randn(sizes[i], sizes[i+1]) * 0.01).astype(self.dtype)
+            self.biases[f"b{i+1}"] = np.zeros((1, sizes[i+1]), dtype=self.dtype)
+
+    def quantize(self):
+        '''
+        Post-training int8 quantization: each weight matrix becomes int8 with one symmetric per-layer scale.
+        Biases stay in the compute dtype. Locking works on the int8 tensors like on float ones.
+        '''
+        for name, weight_matrix in self.weights.items():
+            scale = float(np.max(np.abs(weight_matrix))) / 127 or 1.0
+            self.weights[name] = np.clip(np.round(weight_matrix / scale), -127, 127).astype(np.int8)
+            self.scales[name] = scale
+
+    def dequantize(self):
+        for name, scale in self.scales.items():
+            self.weights[name] = (self.weights[name] * scale).astype(self.dtype)
+        self.scales = {}
+
+    def dequantized_weights(self, i, dtype):
+        '''
+        W{i} as floats. int8 quantized weights are scaled into the shared dequantize buffer, so only
+        one layer ever exists as floats and no temporary is allocated per call.
+        '''
+        weights = self.weights[f"W{i}"]
+        scale = self.scales.get(f"W{i}")
+        if scale is None:
+            return weights
+        size = max(self.weights[name].size for name in self.scales)
+        if self.dequantize_buffer is None or self.dequantize_buffer.size < size or self.dequantize_buffer.dtype != dtype:
+            self.dequantize_buffer = np.empty(size, dtype=dtype)
+        dequantized = self.dequantize_buffer[:weights.size].reshape(weights.shape)
+        np.multiply(weights, dtype.type(scale), out=dequantized)
+        return dequantized
+
+    def dot(self, a, i, out=None):
+        '''
+        a @ W{i}, dequantizing the weights first when they are int8 quantized.
+        '''
+        dtype = np.result_type(a.dtype, self.dtype)
+        return np.dot(a, self.dequantized_weights(i, dtype), out=out)
 
     def forward_pass(self, x):
         activations = {"A0": x}
         for i in range(1, len(self.weights) + 1):
-            z = np.dot(activations[f"A{i-1}"], self.weights[f"W{i}"]) + self.biases[f"b{i}"]
+            z = self.dot(activations[f"A{i-1}"], i) + self.biases[f"b{i}"]
             activations[f"Z{i}"] = z
-            activations[f"A{i}"] = self.relu(z) if i != len(self.weights) else self.softmax(z)
+            activations[f"A{i}"] = self.activate(z, i)
         return activations
 
+    def forward_pass_locked(self, x, key, method=None):
+        '''
+        Forward pass straight on locked weights. The inverse permutations/shifts derived from the key
+        are applied as index remaps on the activations, so the unlocked weights never exist in memory.
+        Activations act row-wise and do not depend on column order, so they are applied in locked order.
+        Returns the output layer activations.
+        '''
+        remaps = perm.activation_remaps(self.weights, key, method or self.locking_method)
+        a = x
+        pending = None # Gather owed by the previous layer's outputs, fused into this layer's input gather
+
+        for i in range(1, len(self.weights) + 1):
+            in_indices, out_indices, bias_indices = remaps[i-1]
+            gather = perm.compose(pending, in_indices)
+            if gather is not None:
+                a = np.take(a, gather, axis=1)
+
+            # Keep the output in locked column order, so the bias is moved into that order instead
+            bias_order = perm.compose(bias_indices, None if out_indices is None else perm.invert_permutation(out_indices))
+            b = self.biases[f"b{i}"] if bias_order is None else np.take(self.biases[f"b{i}"], bias_order, axis=-1)
+            z = self.dot(a, i) + b
+            pending = out_indices
+            a = self.activate(z, i, out=z)
+
+        if pending is not None:
+            a = np.take(a, pending, axis=1)
+        return a
+
     def backward_pass(self, x, y, activations):
         gradients = {}
         m = x.shape[0]
@@ -66,6 +166,70 @@ class MLP:
             self.biases[f"b{i}"] -= self.learning_rate * gradients[f"db{i}"]
 
 
+    def get_inference_buffers(self, block_size, dtype):
+        widths = tuple(self.weights[f"W{i}"].shape[1] for i in range(1, len(self.weights) + 1))
+        key = (block_size, dtype, widths)
+        if self.inference_buffers_key != key:
+            self.inference_buffers = [np.empty((block_size, width), dtype=dtype) for width in widths]
+            self.inference_buffers_key = key
+        return self.inference_buffers
+
+    def infer(self, x, block_size=1024, argmax=False, activate_output=False):
+        '''
+        Inference-only forward pass. Rows are processed in blocks through preallocated per-layer buffers
+        (in-place matmul, bias add and activation), so temporaries scale with block_size, not with len(x).
+        Returns the output logits, the output activations with activate_output=True, or the predicted
+        classes with argmax=True.
+        '''
+        x = np.atleast_2d(x)
+        n_layers = len(self.weights)
+        dtype = np.result_type(x, self.dtype, *self.weights.values(), *self.biases.values())
+        buffers = self.get_inference_buffers(block_size, dtype)
+        result = np.empty(x.shape[0], dtype=np.intp) if argmax else np.empty((x.shape[0], buffers[-1].shape[1]), dtype=dtype)
+
+        for start in range(0, x.shape[0], block_size):
+            a = x[start:start + block_size]
+            rows = a.shape[0]
+            for i in range(1, n_layers + 1):
+                # Logits go straight into the result unless only their argmax is wanted
+                z = result[start:start + rows] if i == n_layers and not argmax else buffers[i-1][:rows]
+                self.dot(a, i, out=z)
+                np.add(z, self.biases[f"b{i}"], out=z)
+                if i != n_layers or (activate_output and not argmax):
+                    self.activate(z, i, out=z)
+                a = z
+
+            if argmax:
+                np.argmax(a, axis=1, out=result[start:start + rows])
+
+        return result
+
     def predict(self, x):
-        activations = self.forward_pass(x)
-        return np.argmax(activations[f"A{len(self.weights)}"], axis=1)
+        return self.infer(x, argmax=True)
+
+    def save(self, path, nonces=None, original_dtypes=None, metadata=None):
+        '''
+        Saves weights, biases and locking method (plus AES nonces/dtypes if given) to a single container file.
+        Entries of metadata are stored next to the model's own (see from_container).
+        '''
+        container.save_model(path, self.weights, self.biases, self.locking_method, nonces, original_dtypes,
+                             metadata={'num_classes': self.num_classes, 'learning_rate': self.learning_rate,
+                                       'dtype': self.dtype.str, 'scales': self.scales, **(metadata or {})})
+
+    @classmethod
+    def from_container(cls, model):
+        mlp = cls(num_classes=model['metadata'].get('num_classes', 10),
+                  learning_rate=model['metadata'].get('learning_rate', 0.01),
+                  dtype=model['metadata'].get('dtype', np.float32))
+        mlp.weights = model['weights']
+        mlp.biases = model['biases']
+        mlp.locking_method = model['locking_method']
+        mlp.scales = model['metadata'].get('scales', {})
+        return mlp
+
+    @classmethod
+    def load(cls, path, mmap_mode='c'):
+        '''
+        Loads a container file; weights and biases are memory-mapped and paged in on first use.
+        '''
+        return cls.from_container(container.load_model(path, mmap_mode))
@@ -1,20 +1,50 @@
 # mlplocker.py
 
 import numpy as np
-import os
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from src.mlp import MLP
+from src import permutations as perm
+from src import aes_locking as aes
+from src import model_container as container
 
 class MLPLocker:
     def __init__(self, mlp_instance):
         self.mlp = mlp_instance
-        self.original_weights = {k: v.copy() for k, v in mlp_instance.weights.items()}
-        self.original_biases = {k: v.copy() for k, v in mlp_instance.biases.items()}
-        self.permutation_matrices = []
+        # Only the layout is kept, so a memory-mapped model is never read in just to be copied
+        self.weight_shapes = {k: v.shape for k, v in mlp_instance.weights.items()}
+        self.weight_dtypes = {k: v.dtype for k, v in mlp_instance.weights.items()}
+        self.permutations = []
         # Attributes for AES locking
         self.nonces = {}
         self.original_dtypes = {}
 
+    def save(self, path):
+        '''
+        Saves the (locked) model together with the AES nonces and dtypes needed to unlock it.
+        '''
+        self.mlp.save(path, self.nonces, self.original_dtypes)
+
+    @classmethod
+    def load(cls, path, mmap_mode='c'):
+        '''
+        Loads a container file written by save() and restores the AES nonces and dtypes.
+        '''
+        model = container.load_model(path, mmap_mode)
+        locker = cls(MLP.from_container(model))
+        locker.nonces = model['nonces']
+        locker.original_dtypes = model['original_dtypes']
+        return locker
+
+    def generate_permutations(self, key, method):
+        '''
+        Derives the permutation index arrays for a permutation locking method from the key seeds.
+        '''
+        if method == 'permutation_matrices_rows':
+            return [perm.permutation_indices(self.mlp.weights[f"W{i+1}"].shape[0], key[i]) for i in range(4)]
+
+        # Permutations {P1Row, P1Col, P2Row, P2Col, P3Row, P3Col, P4Row, P4Col}
+        # Pcols index the m columns and Prows index the n rows given that W is nxm
+        return [perm.permutation_indices(self.mlp.weights[f"W{(i // 2) + 1}"].shape[i % 2], key[i]) for i in range(8)]
+
     def lock(self, key, method):
         if method == 'bias_circular_shifting':
             self.mlp.locking_method = 'bias_circular_shifting'
@@ -34,58 +64,27 @@ class MLPLocker:
         elif method == 'permutation_matrices_rows':
             self.mlp.locking_method = 'permutation_matrices_rows'
 
+            # Row permutations stored as index arrays (P == np.eye(n)[indices])
+            self.permutations = self.generate_permutations(key, method)
+
             for i in range(4):
                 str_name = f"W{i+1}"
-                self.permutation_matrices.append(np.eye(self.mlp.weights[str_name].shape[0]))
-                np.random.seed(key[i])
-                np.random.shuffle(self.permutation_matrices[i])
-                self.mlp.weights[str_name] = np.dot(self.permutation_matrices[i], self.mlp.weights[str_name])
+                self.mlp.weights[str_name] = perm.permute_rows(self.mlp.weights[str_name], self.permutations[i])
 
         elif method == 'permutation_matrices_rows_and_columns':
             self.mlp.locking_method = 'permutation_matrices_rows_and_columns'
-            
-            for i in range(8):
-                str_name = f"W{(i // 2) + 1}" # '//' floors
-                # Permutation matrices {P1Row, P1Col, P2Row, P2Col, P3Row, P3Col, P4Row, P4Col}
-                # Pcols need to be mxm and Prows need to be nxn given that W is mxn
-                if i % 2 == 0:
-                    self.permutation_matrices.append(np.eye(self.mlp.weights[str_name].shape[0]))
-                else:
-                    self.permutation_matrices.append(np.eye(self.mlp.weights[str_name].shape[1]))
-                np.random.seed(key[i])
-                np.random.shuffle(self.permutation_matrices[i])
+            self.permutations = self.generate_permutations(key, method)
             
             for i in range(4):
                 str_name = f"W{i+1}"
-                self.mlp.weights[str_name] = np.dot(self.permutation_matrices[2 * i], self.mlp.weights[str_name])
-                self.mlp.weights[str_name] = np.dot(self.mlp.weights[str_name], self.permutation_matrices[2 * i + 1])
+                self.mlp.weights[str_name] = perm.permute_rows(self.mlp.weights[str_name], self.permutations[2 * i])
+                self.mlp.weights[str_name] = perm.permute_cols(self.mlp.weights[str_name], self.permutations[2 * i + 1])
                 
         elif method == 'aes_128':
             self.mlp.locking_method = 'aes_128'
-            if not isinstance(key, bytes) or len(key) != 16:
-                raise ValueError("AES-128 key must be 16 bytes long.")
-            
-            for str_name, weight_matrix in self.mlp.weights.items():
-                # Store original data type for perfect reconstruction later
-                self.original_dtypes[str_name] = weight_matrix.dtype
-                
-                # Generate and store a unique nonce for each weight matrix
-                nonce = os.urandom(16)
-                self.nonces[str_name] = nonce
-                
-                # Set up the AES cipher in CTR mode
-                cipher = Cipher(algorithms.AES(key), modes.CTR(nonce))
-                encryptor = cipher.encryptor()
-                
-                # Convert the numpy weight matrix to a byte string
-                plaintext_bytes = weight_matrix.tobytes()
-                
-                # Encrypt the bytes
-                ciphertext_bytes = encryptor.update(plaintext_bytes) + encryptor.finalize()
-                
-                # Convert the encrypted bytes back into a numpy array and reshape it
-                encrypted_array = np.frombuffer(ciphertext_bytes, dtype=weight_matrix.dtype)
-                self.mlp.weights[str_name] = encrypted_array.reshape(weight_matrix.shape)
+            # Encrypted into new arrays (in chunks, one layer per thread), so weights shared with other
+            # models are left untouched
+            self.mlp.weights, self.nonces, self.original_dtypes = aes.lock_weights(self.mlp.weights, key)
 
         else:
             raise ValueError('Invalid locking method')
@@ -97,7 +96,7 @@ class MLPLocker:
                 str_name = f"b{i+1}"
                 self.mlp.biases[str_name] = np.roll(self.mlp.biases[str_name], -key[i])
                 
-            self.permutation_matrices = []
+            self.permutations = []
 
         elif self.mlp.locking_method == 'weights_cols_and_rows_circular_shifting':
 
@@ -106,49 +105,39 @@ class MLPLocker:
                 self.mlp.weights[str_name] = np.roll(self.mlp.weights[str_name], -key[2 * i + 1], axis = 1)
                 self.mlp.weights[str_name] = np.roll(self.mlp.weights[str_name], -key[2 * i], axis = 0)
                 
-            self.permutation_matrices = []
+            self.permutations = []
 
         elif self.mlp.locking_method == 'permutation_matrices_rows':
+            # Models locked elsewhere (e.g. loaded from disk) rebuild the permutations from the key
+            if not self.permutations:
+                self.permutations = self.generate_permutations(key, self.mlp.locking_method)
 
             for i in range(4):
                 str_name = f"W{i+1}"
-                self.mlp.weights[str_name] = np.dot(self.permutation_matrices[i].T, self.mlp.weights[str_name])
+                self.mlp.weights[str_name] = perm.unpermute_rows(self.mlp.weights[str_name], self.permutations[i])
                 
-            self.permutation_matrices = []
+            self.permutations = []
                 
         elif self.mlp.locking_method == 'permutation_matrices_rows_and_columns':
+            if not self.permutations:
+                self.permutations = self.generate_permutations(key, self.mlp.locking_method)
             
             for i in range(4):
                 str_name = f"W{i+1}"
-                self.mlp.weights[str_name] = np.dot(self.mlp.weights[str_name], self.permutation_matrices[2 * i + 1].T)
-                self.mlp.weights[str_name] = np.dot(self.permutation_matrices[2 * i].T, self.mlp.weights[str_name])
+                self.mlp.weights[str_name] = perm.unpermute_cols(self.mlp.weights[str_name], self.permutations[2 * i + 1])
+                self.mlp.weights[str_name] = perm.unpermute_rows(self.mlp.weights[str_name], self.permutations[2 * i])
                 
-            self.permutation_matrices = []
+            self.permutations = []
         
         elif self.mlp.locking_method == 'aes_128':
-            if not isinstance(key, bytes) or len(key) != 16:
-                raise ValueError("AES-128 key must be 16 bytes long.")
-
-            for str_name, locked_weight_matrix in self.mlp.weights.items():
-                nonce = self.nonces.get(str_name)
-                if nonce is None:
-                    raise RuntimeError(f"Nonce for {str_name} not found. Model might not be locked correctly.")
-                    
-                # Set up the exact same cipher to decrypt
-                cipher = Cipher(algorithms.AES(key), modes.CTR(nonce))
-                decryptor = cipher.encryptor() # In CTR mode, encryption and decryption are the same operation
-                
-                # Convert locked weights to bytes
-                ciphertext_bytes = locked_weight_matrix.tobytes()
-                
-                # Decrypt the bytes
-                plaintext_bytes = decryptor.update(ciphertext_bytes) + decryptor.finalize()
-                
-                # Convert back to numpy array with original shape and type
-                original_dtype = self.original_dtypes.get(str_name)
-                original_shape = self.original_weights[str_name].shape
-                decrypted_array = np.frombuffer(plaintext_bytes, dtype=original_dtype)
-                self.mlp.weights[str_name] = decrypted_array.reshape(original_shape)
+            # The ciphertext arrays belong to this model (made by lock_weights, or a copy-on-write map
+            # from load), so they are decrypted in place
+            unlocked_weights = aes.unlock_weights(self.mlp.weights, key, self.nonces, inplace=True)
+            for str_name, decrypted_array in unlocked_weights.items():
+                # Reinterpret with original shape and type
+                original_dtype = self.original_dtypes.get(str_name, self.weight_dtypes[str_name])
+                original_shape = self.weight_shapes[str_name]
+                self.mlp.weights[str_name] = decrypted_array.view(original_dtype).reshape(original_shape)
             
             # Clean up stored nonces and dtypes after unlocking
             self.nonces = {}
@@ -159,9 +148,7 @@ class MLPLocker:
         
         
     def test_locking(self, x_test, y_test):
-        test_activations = self.mlp.forward_pass(x_test)
-        test_pred = test_activations[f"A{len(self.mlp.weights)}"]
-        test_accuracy = np.mean(np.argmax(test_pred, axis=1) == np.argmax(y_test, axis=1))
+        test_accuracy = np.mean(self.mlp.predict(x_test) == np.argmax(y_test, axis=1))
         return test_accuracy
     
 # #FAF4F2
\ No newline at end of file
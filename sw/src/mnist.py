@@ -1,71 +1,144 @@
 # mnist.py
 
 import struct
-from array import array
 import numpy as np
+from src.batch_iterator import BatchIterator
+
+def read_idx(filepath, expected_magic):
+    '''
+    Memory-maps an IDX file (uint8 data) right after its header, without reading it.
+    Images come back as (num_images, rows * cols), labels as (num_labels,).
+    '''
+    with open(filepath, 'rb') as file:
+        magic, = struct.unpack(">I", file.read(4))
+        if magic != expected_magic:
+            kind = 'labels' if expected_magic == 2049 else 'images'
+            raise ValueError(f'Magic number mismatch for {kind}, expected {expected_magic}, got {magic}')
+        n_dims = magic & 0xFF
+        dims = struct.unpack(f">{n_dims}I", file.read(4 * n_dims))
+
+    shape = (dims[0], int(np.prod(dims[1:]))) if n_dims > 1 else (dims[0],)
+    return np.memmap(filepath, dtype=np.uint8, mode='r', offset=4 + 4 * n_dims, shape=shape)
 
 class MNIST(object):
+    '''
+    Keeps the raw images and labels as uint8 memory maps. Normalization to float32 [0, 1] and
+    one-hot encoding are done lazily, per batch through get_batch() or on first access of
+    x_train / y_train / x_test / y_test (which materialize and cache the full split).
+    '''
     def __init__(self, training_images_filepath, training_labels_filepath,
-                 test_images_filepath, test_labels_filepath):
+                 test_images_filepath, test_labels_filepath,
+                 load_train=True, load_test=True, num_classes=10):
         self.training_images_filepath = training_images_filepath
         self.training_labels_filepath = training_labels_filepath
         self.test_images_filepath = test_images_filepath
         self.test_labels_filepath = test_labels_filepath
+        self.load_train = load_train
+        self.load_test = load_test
+        self.num_classes = num_classes
+
+        # Raw uint8 data (memory-mapped)
+        self.train_images = None
+        self.train_labels = None
+        self.test_images = None
+        self.test_labels = None
 
-        # Initialize attributes that will hold the loaded and processed data
-        self.x_train = None
-        self.x_test = None
-        self.y_train = None
-        self.y_test = None
+        # Lazily materialized, preprocessed splits
+        self._x_train = None
+        self._x_test = None
+        self._y_train = None
+        self._y_test = None
 
         self.load_data()
 
     def read_images_labels(self, images_filepath, labels_filepath):
-        labels = []
-        with open(labels_filepath, 'rb') as file:
-            magic, size = struct.unpack(">II", file.read(8))
-            if magic != 2049:
-                raise ValueError(f'Magic number mismatch for labels, expected 2049, got {magic}')
-            labels = array("B", file.read())
+        labels = read_idx(labels_filepath, 2049)
+        images = read_idx(images_filepath, 2051)
+        return images, labels
 
-        with open(images_filepath, 'rb') as file:
-            magic, size, rows, cols = struct.unpack(">IIII", file.read(16))
-            if magic != 2051:
-                raise ValueError(f'Magic number mismatch for images, expected 2051, got {magic}')
-            image_data = array("B", file.read())
+    def load_data(self):
+        if self.load_train:
+            self.train_images, self.train_labels = self.read_images_labels(self.training_images_filepath, self.training_labels_filepath)
+        if self.load_test:
+            self.test_images, self.test_labels = self.read_images_labels(self.test_images_filepath, self.test_labels_filepath)
 
-        # Directly convert to numpy array and reshape to (num_images, rows * cols)
-        images = np.frombuffer(image_data, dtype=np.uint8).reshape(size, rows * cols)
+        print(f"MNIST Data memory-mapped:")
+        if self.load_train:
+            print(f"  train images shape: {self.train_images.shape}, labels shape: {self.train_labels.shape}, dtype: {self.train_images.dtype}")
+        if self.load_test:
+            print(f"  test images shape: {self.test_images.shape}, labels shape: {self.test_labels.shape}, dtype: {self.test_images.dtype}")
 
-        return images, np.array(labels) # Return labels as a numpy array too
+        return (self.train_images, self.train_labels), (self.test_images, self.test_labels)
 
-    def load_data(self):
-        # Load raw data
-        x_train_raw, y_train_raw = self.read_images_labels(self.training_images_filepath, self.training_labels_filepath)
-        x_test_raw, y_test_raw = self.read_images_labels(self.test_images_filepath, self.test_labels_filepath)
-
-        # --- Data Preprocessing ---
-
-        # 1. Normalize images to range [0, 1]
-        self.x_train = x_train_raw.astype(np.float32) / 255.0
-        self.x_test = x_test_raw.astype(np.float32) / 255.0
-
-        # 2. One-hot encode labels
-        # 10 classes for MNIST (digits 0-9)
-        num_classes = 10 
-        
-        # Create one-hot encoded y_train
-        self.y_train = np.zeros((y_train_raw.size, num_classes))
-        self.y_train[np.arange(y_train_raw.size), y_train_raw] = 1
-
-        # Create one-hot encoded y_test
-        self.y_test = np.zeros((y_test_raw.size, num_classes))
-        self.y_test[np.arange(y_test_raw.size), y_test_raw] = 1
-        
-        print(f"MNIST Data loaded and processed:")
-        print(f"  x_train shape: {self.x_train.shape}, dtype: {self.x_train.dtype}")
-        print(f"  y_train shape: {self.y_train.shape}, dtype: {self.y_train.dtype}")
-        print(f"  x_test shape: {self.x_test.shape}, dtype: {self.x_test.dtype}")
-        print(f"  y_test shape: {self.y_test.shape}, dtype: {self.y_test.dtype}")
-
-        return (self.x_train, self.y_train), (self.x_test, self.y_test)
+    # --- Data Preprocessing ---
+
+    def normalize(self, images, out=None):
+        '''
+        Scales uint8 images to float32 in [0, 1].
+        '''
+        if out is None:
+            out = np.empty(images.shape, dtype=np.float32)
+        np.divide(images, np.float32(255.0), out=out)
+        return out
+
+    def one_hot(self, labels, out=None):
+        if out is None:
+            out = np.empty((labels.shape[0], self.num_classes), dtype=np.float32)
+        out.fill(0)
+        out[np.arange(labels.shape[0]), labels] = 1
+        return out
+
+    def get_batch(self, split, indices):
+        '''
+        Gathers, normalizes and one-hot encodes only the requested rows of 'train' or 'test'.
+        '''
+        images, labels = (self.train_images, self.train_labels) if split == 'train' else (self.test_images, self.test_labels)
+        return self.normalize(images[indices]), self.one_hot(labels[indices])
+
+    def batches(self, split='train', batch_size=32, shuffle=True, prefetch=True, rng=None):
+        '''
+        Shuffled minibatches of normalized images and one-hot labels, gathered from the raw memmaps
+        into reusable buffers with background prefetch (see BatchIterator).
+        '''
+        images, labels = (self.train_images, self.train_labels) if split == 'train' else (self.test_images, self.test_labels)
+        return BatchIterator(images, labels, batch_size, shuffle, self.normalize, self.one_hot, prefetch, rng=rng)
+
+    @property
+    def x_train(self):
+        if self._x_train is None and self.train_images is not None:
+            self._x_train = self.normalize(self.train_images)
+        return self._x_train
+
+    @x_train.setter
+    def x_train(self, value):
+        self._x_train = value
+
+    @property
+    def y_train(self):
+        if self._y_train is None and self.train_labels is not None:
+            self._y_train = self.one_hot(self.train_labels)
+        return self._y_train
+
+    @y_train.setter
+    def y_train(self, value):
+        self._y_train = value
+
+    @property
+    def x_test(self):
+        if self._x_test is None and self.test_images is not None:
+            self._x_test = self.normalize(self.test_images)
+        return self._x_test
+
+    @x_test.setter
+    def x_test(self, value):
+        self._x_test = value
+
+    @property
+    def y_test(self):
+        if self._y_test is None and self.test_labels is not None:
+            self._y_test = self.one_hot(self.test_labels)
+        return self._y_test
+
+    @y_test.setter
+    def y_test(self, value):
+        self._y_test = value
@@ -0,0 +1,102 @@
+# model_container.py
+#
+# Single-file container for (locked) MLP models.
+#
+# Layout:
+#   0x00    : magic b'PUFMLP01' (8 bytes)
+#   0x08    : manifest length in bytes (uint64, little-endian)
+#   0x10    : JSON manifest (locking method, per-array dtype/shape/offset, AES nonces and dtypes, metadata)
+#   ...     : raw C-ordered array data, starting at the first ALIGNMENT byte boundary after the manifest.
+#             Section offsets in the manifest are relative to that point and are ALIGNMENT aligned too.
+#
+# The sections are plain bytes at known offsets, so the whole file is opened with one np.memmap
+# and each weight/bias is a view into it that is only paged in when it is used.
+
+import json
+import struct
+import numpy as np
+
+MAGIC = b'PUFMLP01'
+ALIGNMENT = 64
+PREFIX = struct.Struct('<8sQ')
+
+def align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def save_model(path, weights, biases, locking_method=None, nonces=None, original_dtypes=None, metadata=None):
+    '''
+    Writes all weights and biases plus the locking information to a single container file.
+    '''
+    nonces = nonces or {}
+    original_dtypes = original_dtypes or {}
+    arrays = {**{name: np.ascontiguousarray(w) for name, w in weights.items()},
+              **{name: np.ascontiguousarray(b) for name, b in biases.items()}}
+
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = align(offset)
+        sections[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset,
+            'nbytes': array.nbytes,
+            'nonce': nonces[name].hex() if name in nonces else None,
+            'original_dtype': np.dtype(original_dtypes[name]).str if name in original_dtypes else None
+        }
+        offset += array.nbytes
+
+    manifest = {
+        'locking_method': locking_method,
+        'weights': list(weights),
+        'biases': list(biases),
+        'sections': sections,
+        'metadata': metadata or {}
+    }
+    manifest_bytes = json.dumps(manifest).encode()
+    data_start = align(PREFIX.size + len(manifest_bytes))
+
+    with open(path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, len(manifest_bytes)))
+        f.write(manifest_bytes)
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + sections[name]['offset'] - f.tell()))
+            f.write(memoryview(array).cast('B'))
+
+def read_manifest(path):
+    '''
+    Returns the manifest and the absolute offset where the array data starts.
+    '''
+    with open(path, 'rb') as f:
+        magic, manifest_length = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f'Magic number mismatch for model container, expected {MAGIC}, got {magic}')
+        return json.loads(f.read(manifest_length)), align(PREFIX.size + manifest_length)
+
+def load_model(path, mmap_mode='c'):
+    '''
+    Opens a container with a single memory map and returns lazily loaded weights and biases.
+    The default copy-on-write mode lets unlocking work in place without touching the file;
+    mmap_mode=None reads everything into memory instead.
+    '''
+    manifest, data_start = read_manifest(path)
+    if mmap_mode is None:
+        with open(path, 'rb') as f:
+            buffer = np.frombuffer(bytearray(f.read()), dtype=np.uint8)
+    else:
+        buffer = np.memmap(path, dtype=np.uint8, mode=mmap_mode)
+
+    arrays = {}
+    for name, section in manifest['sections'].items():
+        start = data_start + section['offset']
+        data = buffer[start:start + section['nbytes']]
+        arrays[name] = data.view(np.dtype(section['dtype'])).reshape(section['shape'])
+
+    return {
+        'weights': {name: arrays[name] for name in manifest['weights']},
+        'biases': {name: arrays[name] for name in manifest['biases']},
+        'locking_method': manifest['locking_method'],
+        'nonces': {name: bytes.fromhex(s['nonce']) for name, s in manifest['sections'].items() if s['nonce'] is not None},
+        'original_dtypes': {name: np.dtype(s['original_dtype']) for name, s in manifest['sections'].items() if s['original_dtype'] is not None},
+        'metadata': manifest['metadata']
+    }
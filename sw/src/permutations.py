@@ -0,0 +1,77 @@
+# permutations.py
+
+import numpy as np
+
+def permutation_indices(n, seed):
+    '''
+    Returns the row order of np.eye(n) after np.random.seed(seed) + np.random.shuffle,
+    i.e. the permutation matrix P == np.eye(n)[indices], stored as an index array.
+    '''
+    return np.random.RandomState(seed).permutation(n)
+
+def invert_permutation(indices):
+    '''
+    Returns the inverse permutation (the index form of P.T).
+    '''
+    return np.argsort(indices)
+
+def permute_rows(matrix, indices):
+    '''
+    Equivalent to np.dot(P, matrix) with P == np.eye(n)[indices].
+    '''
+    return np.take(matrix, indices, axis=0)
+
+def unpermute_rows(matrix, indices):
+    '''
+    Equivalent to np.dot(P.T, matrix) with P == np.eye(n)[indices].
+    '''
+    return np.take(matrix, invert_permutation(indices), axis=0)
+
+def permute_cols(matrix, indices):
+    '''
+    Equivalent to np.dot(matrix, P) with P == np.eye(m)[indices].
+    '''
+    return np.take(matrix, invert_permutation(indices), axis=1)
+
+def unpermute_cols(matrix, indices):
+    '''
+    Equivalent to np.dot(matrix, P.T) with P == np.eye(m)[indices].
+    '''
+    return np.take(matrix, indices, axis=1)
+
+def compose(first, second):
+    '''
+    Index array equivalent to gathering with first and then with second (None means identity).
+    '''
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return np.take(first, second)
+
+def activation_remaps(weights, key, method):
+    '''
+    Returns per-layer (in_indices, out_indices, bias_indices) such that, for the locked W' and b',
+    x @ W + b == np.take(np.take(x, in_indices, axis=1) @ W', out_indices, axis=1) + np.take(b', bias_indices, axis=-1).
+    None means identity, so only the activations are remapped and the unlocked weights are never built.
+    '''
+    remaps = []
+    for i in range(len(weights)):
+        n, m = weights[f"W{i+1}"].shape
+
+        if method == 'bias_circular_shifting':
+            remaps.append((None, None, (np.arange(m) + key[i]) % m))
+
+        elif method == 'weights_cols_and_rows_circular_shifting':
+            remaps.append(((np.arange(n) - key[2 * i]) % n, (np.arange(m) + key[2 * i + 1]) % m, None))
+
+        elif method == 'permutation_matrices_rows':
+            remaps.append((permutation_indices(n, key[i]), None, None))
+
+        elif method == 'permutation_matrices_rows_and_columns':
+            remaps.append((permutation_indices(n, key[2 * i]), permutation_indices(m, key[2 * i + 1]), None))
+
+        else:
+            raise ValueError(f'Locking method {method} cannot be unlocked on the fly')
+
+    return remaps
@@ -0,0 +1,159 @@
+# preprocessing_cache.py
+#
+# Disk cache for data_preprocessing_2.preprocess_csv results.
+#
+# Entries live in <cache_dir>/<key>/ as the .npy files written by preprocess_csv(save_dir=...), plus a
+# meta.json. The key hashes the input file content, the preprocessing parameters (seed included), the source
+# of every module on the preprocessing path and the NumPy/pandas versions, so a changed capture, threshold
+# or implementation never hits a stale entry.
+# Hits are memory-mapped, so a repeat run gets its (X, y) without reading them.
+#
+# File hashes are remembered per (path, size, mtime) in fingerprints.json, so an unchanged capture is
+# not re-read either. Entries are evicted least recently used first once the cache exceeds max_bytes.
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import pandas as pd
+from src import analysis, bit_matrix, capture_file, inter_hamming
+from src import data_preprocessing_2 as dp
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'puf-preprocessing')
+MAX_BYTES = 4 << 30
+HASH_BLOCK = 8 << 20
+# Every module preprocess_csv runs code from
+PREPROCESSING_MODULES = (dp, analysis, bit_matrix, capture_file, inter_hamming)
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK):
+            h.update(block)
+    return h.hexdigest()
+
+def preprocessing_code_hash(modules=PREPROCESSING_MODULES):
+    '''
+    Hash of the preprocessing implementation: the source of its modules and the library versions.
+    '''
+    h = hashlib.sha256(f'numpy {np.__version__} pandas {pd.__version__}'.encode())
+    for module in modules:
+        h.update(f'{module.__name__} {sha256_file(module.__file__)}'.encode())
+    return h.hexdigest()
+
+class PreprocessingCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.code_hash = preprocessing_code_hash()
+
+    # --- Keys ---
+
+    def fingerprint(self, path):
+        '''
+        Content hash of a file, recomputed only when its size or modification time changed.
+        '''
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        memo_path = os.path.join(self.cache_dir, 'fingerprints.json')
+        memo = {}
+        if os.path.exists(memo_path):
+            with open(memo_path) as f:
+                memo = json.load(f)
+
+        size, mtime, digest = memo.get(path, (None, None, None))
+        if (size, mtime) != (stat.st_size, stat.st_mtime_ns):
+            digest = sha256_file(path)
+            memo[path] = (stat.st_size, stat.st_mtime_ns, digest)
+            with open(memo_path + '.tmp', 'w') as f:
+                json.dump(memo, f)
+            os.replace(memo_path + '.tmp', memo_path)
+        return digest
+
+    def key(self, fingerprint, params):
+        blob = json.dumps({'file': fingerprint, 'code': self.code_hash, 'params': params}, sort_keys=True)
+        return hashlib.sha256(blob.encode()).hexdigest()[:32]
+
+    # --- Cached preprocessing ---
+
+    def preprocess_csv(self, csv_path, debug, validity_threshold=20, seed=0):
+        '''
+        Same as data_preprocessing_2.preprocess_csv, but served from the cache when possible.
+        seed=None is not reproducible, so it always recomputes and is not stored.
+        '''
+        if seed is None:
+            return dp.preprocess_csv(csv_path, debug, validity_threshold=validity_threshold)
+
+        fingerprint = self.fingerprint(csv_path)
+        params = {'validity_threshold': validity_threshold, 'seed': seed}
+        entry_dir = os.path.join(self.cache_dir, self.key(fingerprint, params))
+
+        if os.path.exists(os.path.join(entry_dir, 'meta.json')):
+            if debug:
+                print(f"Preprocessed data loaded from cache {entry_dir}")
+            # Directory mtime is the LRU timestamp
+            os.utime(entry_dir)
+            return dp.load_processed(entry_dir)
+
+        # Written under a temporary name and renamed, so a crash never leaves a half entry behind
+        tmp_dir = f'{entry_dir}.tmp{os.getpid()}'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        dp.preprocess_csv(csv_path, debug, save_dir=tmp_dir, validity_threshold=validity_threshold, seed=seed)
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump({'source': os.path.abspath(csv_path), 'fingerprint': fingerprint,
+                       'params': params, 'created': time.time()}, f)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.prune()
+        return dp.load_processed(entry_dir)
+
+    # --- Size limit and invalidation ---
+
+    def entries(self):
+        '''
+        (last use, size in bytes, path) of every entry, least recently used first.
+        '''
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(path) or '.tmp' in name:
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+        return sorted(entries)
+
+    def prune(self, max_bytes=None):
+        '''
+        Evicts least recently used entries until the cache fits in max_bytes.
+        The most recent entry is always kept.
+        '''
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries[:-1]:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def invalidate(self, csv_path=None):
+        '''
+        Removes the entries computed from csv_path, or every entry when csv_path is None.
+        '''
+        source = os.path.abspath(csv_path) if csv_path else None
+        for _, _, path in self.entries():
+            if source is not None:
+                with open(os.path.join(path, 'meta.json')) as f:
+                    if json.load(f)['source'] != source:
+                        continue
+            shutil.rmtree(path, ignore_errors=True)
+
+def cached_preprocess_csv(csv_path, debug, validity_threshold=20, seed=0, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    return PreprocessingCache(cache_dir, max_bytes).preprocess_csv(csv_path, debug, validity_threshold, seed)
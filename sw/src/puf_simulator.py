@@ -0,0 +1,247 @@
+# puf_simulator.py
+#
+# NumPy model of the ring_oscillator_puf_v2 design, for synthetic multi-board captures.
+#
+# Every virtual board has 18 LFSR ROs and 32 main ROs. The expected count of an RO over one comparator
+# window is its per-device nominal count (process variation) scaled by its own linear temperature and
+# Vccint coefficients; every count adds Gaussian jitter that grows with the absolute temperature.
+# One measurement, as in hardware:
+#   - the LFSR ROs give the 9-bit seed, bit i = 1 when RO 2i+1 is slower than RO 2i (pair 0 is the LSB),
+#   - the LFSR (x^9 + x^5 + 1, shift right, mod 496) is clocked once per response bit from the seed and each
+#     value selects a main RO pair through the ro_map BRAM (ro_pair_map.get_indices),
+#   - every pair is compared on fresh counts: bit = count(ro0) > count(ro1), shifted into the 128-bit FIFO.
+# The response string is the FIFO MSB first, so its first character is the last comparison.
+#
+# Measurements are simulated block-wise as whole arrays. Boards are written in the CSV layout read by
+# analysis.py and data_preprocessing_2.py (one file per board), or as binary captures (capture_file.py).
+
+import os
+import sys
+import numpy as np
+from src.capture_file import CSV_COLUMNS, CaptureWriter
+
+# The ro_map BRAM contents come from the module that generates its init file
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'hw', 'common', 'scripts', 'python'))
+from ro_pair_map import get_indices
+
+N_ROS_MAIN = 32
+N_ROS_LFSR = 18
+LFSR_WIDTH = 9
+LFSR_RANGE = 496
+RESPONSE_BITS = 128
+
+BLOCK_ROWS = 1 << 15 # Measurements simulated at a time, to bound the (rows, 128) temporaries
+REFERENCE_TEMPERATURE = 25.0
+REFERENCE_VCCINT = 1.0
+CSV_DECIMALS = 4
+
+def lfsr_sequences(n_steps=RESPONSE_BITS, lfsr_range=LFSR_RANGE):
+    '''
+    (512, n_steps) LFSR output values for every seed, one row per seed, in clocking order.
+    '''
+    state = np.arange(1 << LFSR_WIDTH)
+    values = np.empty((state.size, n_steps), dtype=np.intp)
+    for step in range(n_steps):
+        feedback = (state ^ (state >> 4)) & 1
+        state = (state >> 1) | (feedback << (LFSR_WIDTH - 1))
+        values[:, step] = state % lfsr_range
+    return values
+
+def pair_table(n_ros=N_ROS_MAIN, n_bits=RESPONSE_BITS):
+    '''
+    (512, n_bits, 2) RO pairs of every seed, in response string order (first character first).
+    '''
+    ro0, ro1 = get_indices(lfsr_sequences(n_bits), n_ros)
+    return np.stack([ro0, ro1], axis=-1)[:, ::-1]
+
+def fold(x, low, high):
+    '''
+    Reflects x into [low, high], so a random walk bounces between the limits.
+    '''
+    width = high - low
+    return low + width - np.abs(np.mod(x - low, 2 * width) - width)
+
+def seed_from_bits(bits):
+    return (bits.astype(np.uint16) << np.arange(bits.shape[-1], dtype=np.uint16)).sum(axis=-1, dtype=np.uint16)
+
+class PufSimulator:
+    '''
+    n_boards virtual ring_oscillator_puf_v2 boards. All spreads are relative to mean_count:
+    process_sigma is the device-to-device spread of the nominal counts, the temperature (per degree) and
+    Vccint (per volt) coefficients vary per RO by their _sigma, and jitter is the count noise of one window
+    at REFERENCE_TEMPERATURE. Temperature and Vccint follow a bounded random walk per board.
+
+    correct_seed=True selects the pairs with each board's noise-free seed, as a perfect LFSR correction
+    agent would; with False the measured (possibly flipped) seed is used, as with no agent.
+    '''
+    def __init__(self, n_boards=1, mean_count=30000, process_sigma=0.01, temperature_coefficient=-1e-3,
+                 temperature_coefficient_sigma=5e-5, vccint_coefficient=0.9, vccint_coefficient_sigma=0.02,
+                 jitter=6.7e-4, temperature_range=(25.0, 65.0), vccint_range=(0.97, 1.03), temperature_step=0.05,
+                 vccint_step=5e-4, correct_seed=True, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.n_boards = n_boards
+        self.mean_count = mean_count
+        self.jitter = jitter
+        self.temperature_range = temperature_range
+        self.vccint_range = vccint_range
+        self.temperature_step = temperature_step
+        self.vccint_step = vccint_step
+        self.correct_seed = correct_seed
+
+        # (boards, ROs) nominal counts and coefficients, LFSR ROs first
+        n_ros = N_ROS_LFSR + N_ROS_MAIN
+        self.nominal = mean_count * (1 + self.rng.normal(0, process_sigma, (n_boards, n_ros)))
+        self.temperature_coefficient = self.rng.normal(temperature_coefficient, temperature_coefficient_sigma, (n_boards, n_ros))
+        self.vccint_coefficient = self.rng.normal(vccint_coefficient, vccint_coefficient_sigma, (n_boards, n_ros))
+
+        self.pairs = pair_table()
+        self.pair_matrices = {}
+        self.ideal_seeds = seed_from_bits(self.nominal[:, 1:N_ROS_LFSR:2] < self.nominal[:, 0:N_ROS_LFSR:2])
+        # Where each board's environment random walk currently is
+        self.temperature = self.rng.uniform(*temperature_range, n_boards)
+        self.vccint = self.rng.uniform(*vccint_range, n_boards)
+
+    def environment(self, board, n):
+        '''
+        (temperature, vccint) for the next n steps of the board's random walk.
+        '''
+        walk = np.cumsum(self.rng.normal(0, 1, (2, n)), axis=1)
+        temperature = fold(self.temperature[board] + self.temperature_step * walk[0], *self.temperature_range)
+        vccint = fold(self.vccint[board] + self.vccint_step * walk[1], *self.vccint_range)
+        self.temperature[board], self.vccint[board] = temperature[-1], vccint[-1]
+        return temperature, vccint
+
+    def expected_counts(self, board, ros, temperature, vccint):
+        '''
+        (rows, len(ros)) noise-free counts of the selected ROs at every row's temperature and Vccint.
+        '''
+        temperature, vccint = temperature[:, None], vccint[:, None]
+        counts = self.nominal[board, ros] * (1 + self.temperature_coefficient[board, ros] * (temperature - REFERENCE_TEMPERATURE))
+        counts *= 1 + self.vccint_coefficient[board, ros] * (vccint - REFERENCE_VCCINT)
+        return counts.astype(np.float32)
+
+    def pair_matrix(self, seed):
+        '''
+        (32, 128) +1/-1 matrix such that main RO counts @ matrix = count(ro0) - count(ro1) of every response bit.
+        '''
+        if seed not in self.pair_matrices:
+            matrix = np.zeros((N_ROS_MAIN, RESPONSE_BITS), dtype=np.float32)
+            bits = np.arange(RESPONSE_BITS)
+            matrix[self.pairs[seed, :, 0], bits] += 1
+            matrix[self.pairs[seed, :, 1], bits] -= 1
+            self.pair_matrices[seed] = matrix
+        return self.pair_matrices[seed]
+
+    def noise_sigma(self, temperature):
+        # Thermal jitter grows with the square root of the absolute temperature
+        scale = np.sqrt((temperature + 273.15) / (REFERENCE_TEMPERATURE + 273.15))
+        return (self.jitter * self.mean_count * scale).astype(np.float32)
+
+    def measure_block(self, board, n):
+        '''
+        n measurements of one board as capture columns: LFSR_Seed_Value as (n, 9) bits (MSB first),
+        PUF_Response_Value as (n, 16) packed bytes, and the Vccint/Temperature of both sections.
+        '''
+        # The seed and the response are measured at consecutive steps of the environment walk
+        temperature, vccint = self.environment(board, 2 * n)
+        seed_temperature, seed_vccint = temperature[0::2], vccint[0::2]
+        response_temperature, response_vccint = temperature[1::2], vccint[1::2]
+
+        # --- LFSR seed ---
+        counts = self.expected_counts(board, slice(0, N_ROS_LFSR), seed_temperature, seed_vccint)
+        counts += self.rng.standard_normal(counts.shape, dtype=np.float32) * self.noise_sigma(seed_temperature)[:, None]
+        seeds = seed_from_bits(counts[:, 1::2] < counts[:, 0::2])
+        seed_bits = (seeds[:, None] >> np.arange(LFSR_WIDTH - 1, -1, -1)) & 1
+
+        # --- Response: a fresh count of both ROs of every pair ---
+        counts = self.expected_counts(board, slice(N_ROS_LFSR, None), response_temperature, response_vccint)
+        used_seeds = np.full(n, self.ideal_seeds[board]) if self.correct_seed else seeds
+        differences = np.empty((n, RESPONSE_BITS), dtype=np.float32)
+        # Rows with the same seed compare the same pairs, and a board only shows a few distinct seeds
+        for seed in np.unique(used_seeds):
+            rows = slice(None) if self.correct_seed else used_seeds == seed
+            differences[rows] = counts[rows] @ self.pair_matrix(seed)
+        # count(ro0) - count(ro1) of two independent windows has sqrt(2) times the jitter of one count
+        noise = self.rng.standard_normal(differences.shape, dtype=np.float32)
+        noise *= np.sqrt(2, dtype=np.float32) * self.noise_sigma(response_temperature)[:, None]
+        differences += noise
+        response = np.packbits(differences > 0, axis=1)
+
+        return {
+            'LFSR_Seed_Value': seed_bits.astype(np.uint8),
+            'LFSR_Seed_Vccint': seed_vccint,
+            'LFSR_Seed_Temperature': seed_temperature,
+            'PUF_Response_Value': response,
+            'PUF_Response_Vccint': response_vccint,
+            'PUF_Response_Temperature': response_temperature
+        }
+
+    def measure(self, board, n, block_rows=BLOCK_ROWS):
+        '''
+        Yields the measurements of one board in blocks of at most block_rows (see measure_block).
+        '''
+        for start in range(0, n, block_rows):
+            yield self.measure_block(board, min(block_rows, n - start))
+
+    def write_csv(self, path, board, n, block_rows=BLOCK_ROWS):
+        with open(path, 'wb') as f:
+            f.write((','.join(CSV_COLUMNS) + '\n').encode())
+            for columns in self.measure(board, n, block_rows):
+                f.write(format_csv_rows(columns))
+        return path
+
+    def write_capture(self, path, board, n, block_rows=BLOCK_ROWS):
+        # CaptureWriter appends, but a simulated capture always starts over
+        if os.path.exists(path):
+            os.remove(path)
+        with CaptureWriter(path, board, metadata={'source': 'puf_simulator'}) as writer:
+            for columns in self.measure(board, n, block_rows):
+                writer.append(columns)
+        return path
+
+    def write_boards(self, out_dir, n, prefix='sim', binary=False, block_rows=BLOCK_ROWS):
+        '''
+        n measurements of every board, to <out_dir>/<prefix>_<board>_data.csv (or .bin captures with binary=True).
+        '''
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for board in range(self.n_boards):
+            if binary:
+                paths.append(self.write_capture(os.path.join(out_dir, f'{prefix}_{board}_data.bin'), board, n, block_rows))
+            else:
+                paths.append(self.write_csv(os.path.join(out_dir, f'{prefix}_{board}_data.csv'), board, n, block_rows))
+        return paths
+
+def fixed_point_bytes(values, decimals=CSV_DECIMALS):
+    '''
+    (n, width) ASCII matrix of values with a fixed number of decimals. Leading zeros (and the sign of
+    non-negative values) are NUL bytes, to be dropped once the whole CSV block is assembled.
+    '''
+    scaled = np.rint(np.abs(values) * 10 ** decimals).astype(np.int64)
+    int_digits = len(str(scaled.max(initial=0) // 10 ** decimals))
+    digits = scaled[:, None] // 10 ** np.arange(int_digits + decimals - 1, -1, -1, dtype=np.int64) % 10
+    chars = (digits + ord('0')).astype(np.uint8)
+    # Integer digits before the first non-zero one, keeping the units digit
+    leading = np.cumsum(digits[:, :int_digits - 1] != 0, axis=1) == 0
+    chars[:, :int_digits - 1][leading] = 0
+    sign = np.where((values < 0) & (scaled > 0), ord('-'), 0).astype(np.uint8)
+    point = np.full(len(values), ord('.'), dtype=np.uint8)
+    return np.column_stack([sign, chars[:, :int_digits], point, chars[:, int_digits:]])
+
+def format_csv_rows(columns):
+    '''
+    CSV lines for a block of measure_block columns, built as one byte matrix: bit strings are written as
+    '0'/'1' bytes and floats with fixed_point_bytes, whose NUL padding is dropped at the end.
+    '''
+    fields = []
+    for name in CSV_COLUMNS:
+        values = columns[name]
+        if name == 'PUF_Response_Value':
+            values = np.unpackbits(values, axis=1, count=RESPONSE_BITS)
+        if name.endswith('_Value'):
+            fields.append(values.astype(np.uint8) + np.uint8(ord('0')))
+        else:
+            fields.append(fixed_point_bytes(values))
+        fields.append(np.full((len(values), 1), ord(','), dtype=np.uint8))
+    fields[-1][:] = ord('\n')
+    return np.hstack(fields).tobytes().replace(b'\0', b'')
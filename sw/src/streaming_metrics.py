@@ -0,0 +1,239 @@
+# streaming_metrics.py
+
+import io
+import json
+import numpy as np
+import pandas as pd
+from src.bit_matrix import BitMatrix
+
+BLOCK_BYTES = 32 << 20 # CSV bytes parsed at a time
+
+class StreamingMetrics:
+    '''
+    Incremental PUF quality metrics over one response section ('PUF_Response' or 'LFSR_Seed') of the
+    capture CSV layout. Only counts are kept, so memory is constant in the number of rows:
+
+      - per-bit one-counts            -> bias / bit-aliasing, majority ideal value
+      - Hamming weight histogram      -> uniformity
+      - intra-HD histogram            -> reliability, against a fixed reference or the evolving majority
+                                         of this board's own responses (kept per board across merges)
+      - per-bit flip counts binned by temperature and by Vccint
+
+    Accumulators can be checkpointed (save/load) and merged across boards.
+    '''
+    def __init__(self, n_bits, section='PUF_Response', reference=None, temperature_bins=None, vccint_bins=None, board=None):
+        self.n_bits = n_bits
+        self.board = board
+        self.section = section
+        # Fixed reference response (bit string), or None to use the majority of everything seen so far
+        self.reference = reference
+        self.temperature_bins = np.asarray(temperature_bins if temperature_bins is not None else np.arange(20, 81, 5), dtype=float)
+        self.vccint_bins = np.asarray(vccint_bins if vccint_bins is not None else np.arange(0.95, 1.051, 0.01), dtype=float)
+
+        self.num_responses = 0
+        self.ones = np.zeros(n_bits, dtype=np.int64)
+        self.hamming_weight_histogram = np.zeros(n_bits + 1, dtype=np.int64)
+        self.intra_hd_histogram = np.zeros(n_bits + 1, dtype=np.int64)
+        self.temperature_counts = np.zeros(len(self.temperature_bins) - 1, dtype=np.int64)
+        self.temperature_flips = np.zeros((len(self.temperature_bins) - 1, n_bits), dtype=np.int64)
+        self.vccint_counts = np.zeros(len(self.vccint_bins) - 1, dtype=np.int64)
+        self.vccint_flips = np.zeros((len(self.vccint_bins) - 1, n_bits), dtype=np.int64)
+
+        # Bytes of each CSV already consumed, so re-runs only process appended rows
+        self.file_offsets = {}
+        # Majority response of every merged board, for bit-aliasing
+        self.board_ideals = {}
+        # One-counts of this accumulator's own responses only (never merged), behind its evolving reference
+        self.own_responses = 0
+        self.own_ones = np.zeros(n_bits, dtype=np.int64)
+
+    # --- Updates ---
+
+    def update(self, bits, temperature=None, vccint=None):
+        '''
+        Adds a batch of responses (BitMatrix) with optional per-row temperature / Vccint values.
+        '''
+        bit_counts = bits.bit_counts()
+        self.num_responses += len(bits)
+        self.ones += bit_counts
+        self.own_responses += len(bits)
+        self.own_ones += bit_counts
+        self.hamming_weight_histogram += np.bincount(bits.ones_per_row(), minlength=self.n_bits + 1)
+
+        reference = self.reference if self.reference is not None else self.own_ideal_value
+        self.intra_hd_histogram += np.bincount(bits.hamming_to(reference), minlength=self.n_bits + 1)
+
+        if temperature is not None or vccint is not None:
+            flips = bits.flips(reference)
+            if temperature is not None:
+                self.add_binned(flips, temperature, self.temperature_bins, self.temperature_counts, self.temperature_flips)
+            if vccint is not None:
+                self.add_binned(flips, vccint, self.vccint_bins, self.vccint_counts, self.vccint_flips)
+
+    def add_binned(self, flips, values, edges, counts, binned_flips):
+        values = np.asarray(values, dtype=float)
+        bins = np.searchsorted(edges, values, side='right') - 1
+        # Values outside the edges (or NaN) are not binned
+        valid = (bins >= 0) & (bins < len(edges) - 1) & ~np.isnan(values)
+        counts += np.bincount(bins[valid], minlength=len(counts))
+        for b in np.unique(bins[valid]):
+            binned_flips[b] += flips[valid & (bins == b)].sum(axis=0)
+
+    def update_sample(self, response, temperature=None, vccint=None):
+        '''
+        Adds one live sample (bit string).
+        '''
+        self.update(BitMatrix.from_strings([response], self.n_bits),
+                    None if temperature is None else [temperature],
+                    None if vccint is None else [vccint])
+
+    def update_df(self, df):
+        '''
+        Adds a chunk in the capture CSV layout ({section}_Value / _Temperature / _Vccint columns).
+        '''
+        bits = BitMatrix.from_strings(df[f'{self.section}_Value'].astype(str).to_numpy(), self.n_bits)
+        temperature = pd.to_numeric(df[f'{self.section}_Temperature'], errors='coerce').to_numpy()
+        vccint = pd.to_numeric(df[f'{self.section}_Vccint'], errors='coerce').to_numpy()
+        self.update(bits, temperature, vccint)
+
+    def consume_csv(self, csv_path, block_bytes=BLOCK_BYTES):
+        '''
+        Processes the rows appended to a capture CSV since the last call, block by block.
+        A trailing line that is still being written is left for the next call.
+        Returns the number of new rows.
+        '''
+        new_rows = 0
+        with open(csv_path, 'rb') as f:
+            header = f.readline()
+            columns = header.decode().strip().split(',')
+            f.seek(max(self.file_offsets.get(csv_path, 0), len(header)))
+
+            pending = b''
+            while True:
+                block = f.read(block_bytes)
+                if not block:
+                    break
+                block = pending + block
+                end = block.rfind(b'\n') + 1
+                pending = block[end:]
+                if end == 0:
+                    continue
+
+                df = pd.read_csv(io.BytesIO(block[:end]), names=columns, header=None, dtype=str)
+                self.update_df(df)
+                new_rows += len(df)
+                self.file_offsets[csv_path] = f.tell() - len(pending)
+
+        return new_rows
+
+    # --- Metrics ---
+
+    @property
+    def ideal_value(self):
+        '''
+        Majority response over everything counted, merged boards included.
+        '''
+        ideal_bits = (self.ones > self.num_responses - self.ones).astype(np.uint8)
+        return bytes(ideal_bits + ord('0')).decode('ascii')
+
+    @property
+    def own_ideal_value(self):
+        '''
+        Majority response of this accumulator's own responses, i.e. of its board even after merges.
+        '''
+        ideal_bits = (self.own_ones > self.own_responses - self.own_ones).astype(np.uint8)
+        return bytes(ideal_bits + ord('0')).decode('ascii')
+
+    @property
+    def bias(self):
+        '''
+        Fraction of ones per bit over all responses seen.
+        '''
+        return self.ones / max(self.num_responses, 1)
+
+    @property
+    def bit_aliasing(self):
+        '''
+        Fraction of boards whose majority response has a one at each bit (needs merged boards).
+        '''
+        ideals = self.all_board_ideals()
+        if not ideals:
+            return None
+        return BitMatrix.from_strings(list(ideals.values()), self.n_bits).bit_counts() / len(ideals)
+
+    def all_board_ideals(self):
+        ideals = dict(self.board_ideals)
+        if self.board is not None and self.own_responses:
+            ideals[self.board] = self.own_ideal_value
+        return ideals
+
+    @property
+    def uniformity(self):
+        return np.dot(np.arange(self.n_bits + 1), self.hamming_weight_histogram) / max(self.num_responses * self.n_bits, 1)
+
+    @property
+    def reliability(self):
+        '''
+        1 - mean fractional intra-HD against the reference.
+        '''
+        mean_hd = np.dot(np.arange(self.n_bits + 1), self.intra_hd_histogram) / max(self.intra_hd_histogram.sum(), 1)
+        return 1 - mean_hd / self.n_bits
+
+    def binned_flip_rates(self, by='temperature'):
+        '''
+        Per-bit flip rates for every temperature / Vccint bin, as a DataFrame indexed by bin.
+        '''
+        edges, counts, flips = ((self.temperature_bins, self.temperature_counts, self.temperature_flips)
+                                if by == 'temperature' else (self.vccint_bins, self.vccint_counts, self.vccint_flips))
+        index = pd.IntervalIndex.from_breaks(edges, closed='left')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = flips / counts[:, None]
+        return pd.DataFrame(rates, index=index, columns=range(1, self.n_bits + 1))
+
+    # --- Checkpointing and merging ---
+
+    def merge(self, other):
+        '''
+        Adds the counts of another accumulator (e.g. another board) into this one.
+        The other boards' majorities are recorded, so bit-aliasing stays per board, and the evolving
+        reference of later updates stays the majority of this board's own responses.
+        '''
+        if (other.n_bits != self.n_bits or not np.array_equal(other.temperature_bins, self.temperature_bins)
+                or not np.array_equal(other.vccint_bins, self.vccint_bins)):
+            raise ValueError('Only accumulators with the same bit width and bins can be merged')
+
+        self.board_ideals.update(other.all_board_ideals())
+        for name in ['num_responses', 'ones', 'hamming_weight_histogram', 'intra_hd_histogram',
+                     'temperature_counts', 'temperature_flips', 'vccint_counts', 'vccint_flips']:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.file_offsets.update(other.file_offsets)
+        return self
+
+    def save(self, path):
+        np.savez(path,
+                 ones=self.ones, hamming_weight_histogram=self.hamming_weight_histogram,
+                 intra_hd_histogram=self.intra_hd_histogram, own_ones=self.own_ones,
+                 temperature_bins=self.temperature_bins, temperature_counts=self.temperature_counts,
+                 temperature_flips=self.temperature_flips,
+                 vccint_bins=self.vccint_bins, vccint_counts=self.vccint_counts, vccint_flips=self.vccint_flips,
+                 state=json.dumps({'n_bits': self.n_bits, 'section': self.section, 'reference': self.reference,
+                                   'board': self.board, 'num_responses': self.num_responses,
+                                   'own_responses': self.own_responses,
+                                   'file_offsets': self.file_offsets, 'board_ideals': self.board_ideals}))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            state = json.loads(str(data['state']))
+            metrics = cls(state['n_bits'], state['section'], state['reference'],
+                          data['temperature_bins'], data['vccint_bins'], state['board'])
+            for name in ['ones', 'hamming_weight_histogram', 'intra_hd_histogram', 'temperature_counts',
+                         'temperature_flips', 'vccint_counts', 'vccint_flips']:
+                setattr(metrics, name, data[name])
+            # Checkpoints from before own counts were kept were never merged into
+            metrics.own_ones = data['own_ones'] if 'own_ones' in data.files else data['ones']
+        metrics.own_responses = state.get('own_responses', state['num_responses'])
+        metrics.num_responses = state['num_responses']
+        metrics.file_offsets = state['file_offsets']
+        metrics.board_ideals = state['board_ideals']
+        return metrics
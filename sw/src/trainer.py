@@ -0,0 +1,132 @@
+# trainer.py
+
+import numpy as np
+from src.batch_iterator import BatchIterator
+
+class Trainer:
+    '''
+    Minibatch SGD for an MLP with persistent activation and gradient buffers.
+    The backward pass updates each layer as soon as its gradients are known, and training
+    accuracy is counted on the fly from the minibatch outputs instead of an extra full forward pass.
+    '''
+    def __init__(self, mlp, batch_size=32, learning_rate=None):
+        if mlp.scales:
+            raise ValueError('Quantized models cannot be trained, call dequantize() first')
+
+        self.mlp = mlp
+        self.batch_size = batch_size
+        self.learning_rate = mlp.learning_rate if learning_rate is None else learning_rate
+        self.n_layers = len(mlp.weights)
+
+        # Training runs in the model's compute dtype
+        dtype = mlp.dtype
+        for i in range(1, self.n_layers + 1):
+            mlp.weights[f"W{i}"] = mlp.cast(mlp.weights[f"W{i}"])
+            mlp.biases[f"b{i}"] = mlp.cast(mlp.biases[f"b{i}"])
+        widths = [mlp.weights[f"W{i}"].shape[1] for i in range(1, self.n_layers + 1)]
+
+        # A[i] holds the activations of layer i (ReLU / softmax applied in place on top of Z)
+        self.activations = [np.empty((batch_size, width), dtype=dtype) for width in widths]
+        # Layer errors, and the ReLU masks they are gated with on the way back
+        self.deltas = [np.empty((batch_size, width), dtype=dtype) for width in widths]
+        self.masks = [np.empty((batch_size, width), dtype=bool) for width in widths]
+        self.dW = {name: np.empty_like(w) for name, w in mlp.weights.items()}
+        self.db = {name: np.empty_like(b) for name, b in mlp.biases.items()}
+
+    def forward(self, x):
+        rows = x.shape[0]
+        a = x
+        for i in range(1, self.n_layers + 1):
+            z = self.activations[i-1][:rows]
+            np.dot(a, self.mlp.weights[f"W{i}"], out=z)
+            np.add(z, self.mlp.biases[f"b{i}"], out=z)
+            if i != self.n_layers:
+                np.maximum(z, 0, out=z)
+            else:
+                # Softmax in place
+                np.subtract(z, np.max(z, axis=1, keepdims=True), out=z)
+                np.exp(z, out=z)
+                np.divide(z, np.sum(z, axis=1, keepdims=True), out=z)
+            a = z
+        return a
+
+    def train_step(self, x, y):
+        '''
+        One forward/backward pass with the SGD update fused into the backward loop.
+        Returns the number of correctly classified samples of the batch (before the update).
+        '''
+        rows = x.shape[0]
+        x = x.astype(self.mlp.dtype, copy=False)
+        output = self.forward(x)
+        correct = np.count_nonzero(np.argmax(output, axis=1) == np.argmax(y, axis=1))
+
+        # Output layer error (softmax + cross-entropy)
+        delta = self.deltas[-1][:rows]
+        np.subtract(output, y, out=delta)
+        step = self.learning_rate / rows
+
+        for i in reversed(range(1, self.n_layers + 1)):
+            a_prev = x if i == 1 else self.activations[i-2][:rows]
+            dW = self.dW[f"W{i}"]
+            db = self.db[f"b{i}"]
+            np.dot(a_prev.T, delta, out=dW)
+            np.sum(delta, axis=0, keepdims=db.ndim > 1, out=db)
+
+            # Backpropagate through the weights before they are updated
+            if i > 1:
+                delta_prev = self.deltas[i-2][:rows]
+                mask = self.masks[i-2][:rows]
+                np.dot(delta, self.mlp.weights[f"W{i}"].T, out=delta_prev)
+                np.greater(a_prev, 0, out=mask)
+                np.multiply(delta_prev, mask, out=delta_prev)
+
+            dW *= step
+            db *= step
+            self.mlp.weights[f"W{i}"] -= dW
+            self.mlp.biases[f"b{i}"] -= db
+
+            if i > 1:
+                delta = delta_prev
+
+        return correct
+
+    def train_epoch(self, x, y, rng=None):
+        '''
+        Runs one shuffled epoch and returns the training accuracy measured on the fly.
+        x, y may also be a BatchIterator (e.g. MNIST.batches()) with y=None.
+        '''
+        batches = x if y is None else BatchIterator(x, y, self.batch_size, rng=rng)
+        correct = 0
+        seen = 0
+        for x_batch, y_batch in batches:
+            correct += self.train_step(x_batch, y_batch)
+            seen += x_batch.shape[0]
+        return correct / seen
+
+    def evaluate(self, x, y, samples=None, rng=None):
+        '''
+        Accuracy on the full set, or on a random sample of the given size.
+        '''
+        if samples is not None and samples < x.shape[0]:
+            rng = rng or np.random.default_rng()
+            subset = rng.choice(x.shape[0], size=samples, replace=False)
+            x, y = x[subset], y[subset]
+        labels = np.argmax(y, axis=1) if y.ndim > 1 else y
+        return np.mean(self.mlp.predict(x) == labels)
+
+    def fit(self, x, y, num_epochs, eval_samples=None, rng=None, verbose=True):
+        '''
+        Trains for num_epochs. Reports the on-the-fly training accuracy, or the accuracy of the
+        updated model on eval_samples random training samples when given. Returns the per-epoch accuracies.
+        '''
+        rng = rng or np.random.default_rng()
+        history = []
+        batches = BatchIterator(x, y, self.batch_size, rng=rng)
+        for epoch in range(num_epochs):
+            train_accuracy = self.train_epoch(batches, None)
+            if eval_samples is not None:
+                train_accuracy = self.evaluate(x, y, eval_samples, rng)
+            history.append(train_accuracy)
+            if verbose:
+                print(f"Epoch {epoch + 1}, training accuracy: {train_accuracy * 100:.2f}%")
+        return history
@@ -0,0 +1,29 @@
+import numpy as np
+from src import aes_locking as aes
+
+KEY = bytes(range(16))
+
+def weights():
+    rng = np.random.default_rng(0)
+    return {'W1': rng.standard_normal((8, 4)).astype(np.float32), 'W2': rng.integers(-127, 128, (4, 3), dtype=np.int8)}
+
+def test_lock_leaves_callers_arrays_untouched():
+    original = weights()
+    shared = {name: w.copy() for name, w in original.items()}
+    locked, nonces, _ = aes.lock_weights(shared, KEY)
+    for name in original:
+        np.testing.assert_array_equal(shared[name], original[name])
+        assert not np.array_equal(locked[name], original[name])
+
+    unlocked = aes.unlock_weights(locked, KEY, nonces)
+    for name in original:
+        np.testing.assert_array_equal(unlocked[name], original[name])
+
+def test_inplace_round_trip():
+    original = weights()
+    arrays = {name: w.copy() for name, w in original.items()}
+    locked, nonces, _ = aes.lock_weights(arrays, KEY, inplace=True)
+    assert all(locked[name] is arrays[name] for name in arrays)
+    aes.unlock_weights(locked, KEY, nonces, inplace=True)
+    for name in original:
+        np.testing.assert_array_equal(arrays[name], original[name])
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from src import inter_hamming as ih
+from src.bit_matrix import BitMatrix
+
+def responses(n, n_bits=16):
+    return BitMatrix.from_bits(np.random.default_rng(0).integers(0, 2, (n, n_bits), dtype=np.uint8))
+
+@pytest.mark.parametrize('n', [0, 1])
+def test_sample_needs_two_responses(n):
+    with pytest.raises(ValueError, match='at least 2 responses'):
+        ih.sample_inter_hamming(responses(n), 10)
+
+def test_histogram_mean_needs_pairs():
+    with pytest.raises(ValueError, match='at least 2 responses'):
+        ih.histogram_mean(ih.inter_hamming_histogram(responses(1)), 16)
+
+def test_sampled_pairs_are_distinct_responses():
+    bits = responses(2)
+    distances = ih.sample_inter_hamming(bits, 50, np.random.default_rng(1))
+    assert np.all(distances == bits[np.array([0])].hamming_pairs(bits[np.array([1])]))
@@ -0,0 +1,29 @@
+import numpy as np
+from src import config
+from src.locking_evaluation import evaluate_locking, random_keys
+from src.mlp import MLP
+
+def quantized_model(rng):
+    sizes = [32, 24, 16, 12, 10]
+    layers = {}
+    for i in range(4):
+        layers[f"W{i+1}"] = rng.standard_normal((sizes[i], sizes[i+1])) * 0.5
+        layers[f"b{i+1}"] = rng.standard_normal((1, sizes[i+1])) * 0.1
+    mlp = MLP(**layers)
+    x = rng.standard_normal((600, sizes[0])).astype(np.float32)
+    labels = mlp.predict(x)
+    # Flip some labels, so the accuracy to match is not trivially 1
+    labels[::3] = rng.integers(0, 10, labels[::3].size)
+    mlp.quantize()
+    return mlp, x, labels
+
+def test_quantized_unlocked_accuracy_matches_predict():
+    rng = np.random.default_rng(0)
+    mlp, x, labels = quantized_model(rng)
+    expected = np.mean(mlp.predict(x) == labels)
+
+    keys = {method: random_keys(method, 2, rng) for method in config.LOCKING_METHODS}
+    results = evaluate_locking(mlp, keys, x, labels, block_size=100, max_workers=1)
+
+    assert len(results) == 2 * len(config.LOCKING_METHODS)
+    np.testing.assert_allclose(results['unlocked_accuracy'], expected)
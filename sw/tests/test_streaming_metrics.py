@@ -0,0 +1,28 @@
+import numpy as np
+from src.bit_matrix import BitMatrix
+from src.streaming_metrics import StreamingMetrics
+
+N_BITS = 16
+
+def board(name, ideal, n=20):
+    metrics = StreamingMetrics(N_BITS, board=name)
+    metrics.update(BitMatrix.from_strings([ideal] * n, N_BITS))
+    return metrics
+
+def test_merge_keeps_each_boards_reference():
+    a, b = '0' * N_BITS, '1' * N_BITS
+    merged = board('a', a).merge(board('b', b, n=40))
+    # The combined majority is now b's response, but later samples of board a are still
+    # measured against a's own majority
+    assert merged.ideal_value == b
+    merged.update_sample(a)
+    assert merged.intra_hd_histogram[0] == 61
+    assert merged.all_board_ideals() == {'a': a, 'b': b}
+
+def test_own_counts_survive_checkpoints(tmp_path):
+    merged = board('a', '0' * N_BITS).merge(board('b', '1' * N_BITS, n=40))
+    merged.save(tmp_path / 'metrics.npz')
+    loaded = StreamingMetrics.load(tmp_path / 'metrics.npz')
+    assert loaded.own_ideal_value == merged.own_ideal_value
+    assert loaded.own_responses == 20
+    np.testing.assert_array_equal(loaded.ones, merged.ones)